@@ -0,0 +1,360 @@
+"""Проверка запросов API на тестовых данных.
+
+Общая часть тестов api/tests и команды benchmark_api: набор тестовых
+данных, список GET-маршрутов, перехват SQL-запросов, которые выполняет
+каждый маршрут, и разбор их планов.
+"""
+import os
+import random
+import re
+import tempfile
+from contextlib import contextmanager
+from itertools import count
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test.utils import (override_settings, setup_databases,
+                               setup_test_environment, teardown_databases,
+                               teardown_test_environment)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.throttling import TokenBucketThrottle
+from recipes.models import (Cart, Favourite, Ingredient, IngredientForRecipe,
+                            Recipe, Tag)
+from users.models import Follow
+
+User = get_user_model()
+
+# Небольшой PNG 1x1 для рецептов и аватаров
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAIAAACQd1PeAAAAD'
+    'ElEQVR4nGP4z8AAAAMBAQDJ/pLvAAAAAElFTkSuQmCC'
+)
+
+PASSWORD = 'Foodgram-audit-2024'
+
+PAGE_SIZES = (6, 20, 100)
+# recipe-list запрашивает вторую страницу при каждом размере из PAGE_SIZES
+MIN_RECIPES = max(PAGE_SIZES) + 1
+
+WORDS = (
+    'борщ', 'суп', 'салат', 'пирог', 'каша', 'рагу', 'плов', 'омлет',
+    'котлеты', 'блины', 'запеканка', 'паста',
+)
+
+
+@contextmanager
+def test_database(on_disk=False):
+    """Временная тестовая база, как у manage.py test.
+
+    Загруженные картинки пишутся во временный каталог вместо MEDIA_ROOT.
+    on_disk размещает тестовую базу SQLite в файле, а не в памяти: так с
+    ней могут одновременно работать несколько потоков.
+    """
+    setup_test_environment()
+    with tempfile.TemporaryDirectory() as directory:
+        if on_disk:
+            for connection in connections.all():
+                test = connection.settings_dict['TEST']
+                if connection.vendor == 'sqlite' and not test['MIRROR']:
+                    test['NAME'] = os.path.join(
+                        directory, f'{connection.alias}.sqlite3'
+                    )
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            with override_settings(MEDIA_ROOT=directory):
+                yield
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+
+def throttle_rates(**rates):
+    """Временно меняет DEFAULT_THROTTLE_RATES; None отключает область.
+
+    Обход всех маршрутов с большими страницами одним пользователем
+    исчерпал бы ведро user_read. Работает как контекстный менеджер и
+    как декоратор, в том числе класса тестов.
+    """
+    return mock.patch.dict(TokenBucketThrottle.THROTTLE_RATES, rates)
+
+
+@transaction.atomic
+def seed(users=50, recipes=500, ingredients=300, tags=5, seed=1):
+    """Заполняет базу связанными данными через ORM, с сигналами."""
+    rnd = random.Random(seed)
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'ингредиент {i}', measurement_unit='г')
+        for i in range(ingredients)
+    )
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    tag_list = [
+        Tag.objects.create(name=f'Тег {i}', slug=f'tag{i}')
+        for i in range(tags)
+    ]
+    # Хэш пароля считается один раз: PBKDF2 на каждого пользователя
+    # занимает больше времени, чем всё остальное заполнение
+    password = make_password(PASSWORD)
+    user_list = [
+        User.objects.create(
+            username=f'user{i:04d}', email=f'user{i}@example.com',
+            password=password, first_name='Имя', last_name='Фамилия'
+        )
+        for i in range(users)
+    ]
+    for user in user_list:
+        Token.objects.create(user=user)
+    for user in user_list:
+        for author in rnd.sample(user_list, min(10, users)):
+            if author != user:
+                Follow.objects.create(user=user, author=author)
+    for i in range(recipes):
+        recipe = Recipe.objects.create(
+            name=f'{rnd.choice(WORDS)} {i}',
+            text=' '.join(rnd.choices(WORDS, k=12)),
+            author=rnd.choice(user_list),
+            cooking_time=rnd.randint(5, 120),
+        )
+        recipe.tags.set(rnd.sample(tag_list, 2))
+        recipe.ingredients.set([
+            IngredientForRecipe.objects.get_or_create(
+                ingredient_id=ingredient_id, amount=rnd.randint(1, 10)
+            )[0]
+            for ingredient_id in rnd.sample(ingredient_ids, 6)
+        ])
+    recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+    for user in user_list:
+        for recipe_id in rnd.sample(recipe_ids, 20):
+            Favourite.objects.create(author=user, recipe_id=recipe_id)
+        for recipe_id in rnd.sample(recipe_ids, 5):
+            Cart.objects.create(author=user, recipe_id=recipe_id)
+    return user_list
+
+
+def get_client(user=None):
+    client = APIClient()
+    if user is not None:
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def get_routes(user):
+    """GET-маршруты API с параметрами запросов фронтенда."""
+    # При небольшом числе рецептов у пользователя их может не быть
+    recipe = (
+        Recipe.objects.filter(author=user).first() or Recipe.objects.first()
+    )
+    author = Follow.objects.filter(user=user).first().author
+    ingredient_ids = ','.join(
+        str(pk) for pk in recipe.ingredients.values_list(
+            'ingredient_id', flat=True
+        )
+    )
+    tag = recipe.tags.first()
+    return {
+        'recipe-list': '/api/recipes/?page=2&limit={limit}',
+        'recipe-list-tags': '/api/recipes/?tags=tag1&tags=tag2&limit={limit}',
+        'recipe-list-author': f'/api/recipes/?author={author.pk}'
+                              '&limit={limit}',
+        'recipe-list-favorited': '/api/recipes/?is_favorited=1&limit={limit}',
+        'recipe-list-cart': '/api/recipes/?is_in_shopping_cart=1'
+                            '&limit={limit}',
+        'recipe-list-search': '/api/recipes/?search=борщ&limit={limit}',
+        'recipe-list-has-ingredients': '/api/recipes/?has_ingredients='
+                                       f'{ingredient_ids.split(",")[0]}'
+                                       '&limit={limit}',
+        'recipe-list-can-cook-with': '/api/recipes/?can_cook_with='
+                                     f'{ingredient_ids}'
+                                     '&limit={limit}',
+        'recipe-list-popular': '/api/recipes/?ordering=popular'
+                               '&limit={limit}',
+        'recipe-list-cursor': '/api/recipes/?cursor=&limit={limit}',
+        'recipe-top': '/api/recipes/top/?limit={limit}',
+        'recipe-feed': '/api/recipes/feed/?limit={limit}',
+        'recipe-detail': f'/api/recipes/{recipe.pk}/',
+        'recipe-get-link': f'/api/recipes/{recipe.pk}/get-link/',
+        'short-link': f'/r/{recipe.short_link}/',
+        'download-shopping-cart': '/api/recipes/download_shopping_cart/',
+        'tag-list': '/api/tags/',
+        'tag-detail': f'/api/tags/{tag.pk}/',
+        'ingredient-list': '/api/ingredients/',
+        'ingredient-search': '/api/ingredients/?name=ингредиент',
+        'ingredient-detail': '/api/ingredients/'
+                             f'{ingredient_ids.split(",")[0]}/',
+        'user-list': '/api/users/?limit={limit}',
+        'user-detail': f'/api/users/{author.pk}/',
+        'user-me': '/api/users/me/',
+        'subscriptions': '/api/users/subscriptions/?limit={limit}'
+                         '&recipes_limit=3',
+    }
+
+
+def call_reads(request, user):
+    """Вызывает GET-маршруты; списки — с каждым размером страницы.
+
+    request(key, client, method, url, data=None) выполняет запрос и
+    возвращает ответ.
+    """
+    client = get_client(user)
+    for name, url in get_routes(user).items():
+        if '{limit}' not in url:
+            request(name, client, 'get', url)
+            continue
+        for size in PAGE_SIZES:
+            request(
+                f'{name}?limit={size}', client, 'get', url.format(limit=size)
+            )
+
+
+# Анонимные запросы ограничиваются по IP, поэтому у каждого свой
+anonymous_addresses = count(1)
+
+
+def get_anonymous_client():
+    number = next(anonymous_addresses)
+    client = get_client()
+    client.defaults['REMOTE_ADDR'] = (
+        f'10.0.{number // 256 % 256}.{number % 256}'
+    )
+    return client
+
+
+def call_writes(request, user, i):
+    """Вызывает пишущие маршруты; i делает имена новых объектов уникальными.
+
+    request — как в call_reads.
+    """
+    client = get_client(user)
+    call_recipe_writes(request, client, i)
+    recipe = Recipe.objects.exclude(favorites__author=user).first()
+    url = f'/api/recipes/{recipe.pk}/favorite/'
+    request('favorite-create', client, 'post', url)
+    request('favorite-delete', client, 'delete', url)
+    recipe = Recipe.objects.exclude(carts__author=user).first()
+    url = f'/api/recipes/{recipe.pk}/shopping_cart/'
+    request('cart-create', client, 'post', url)
+    request('cart-delete', client, 'delete', url)
+    author = User.objects.exclude(pk=user.pk).exclude(
+        respondents__user=user
+    ).first()
+    url = f'/api/users/{author.pk}/subscribe/'
+    request('subscribe-create', client, 'post', f'{url}?recipes_limit=3')
+    request('subscribe-delete', client, 'delete', url)
+    url = '/api/users/me/avatar/'
+    request('avatar-update', client, 'put', url, {'avatar': IMAGE})
+    request('avatar-delete', client, 'delete', url)
+    request(
+        'set-password', client, 'post', '/api/users/set_password/',
+        {'current_password': PASSWORD, 'new_password': PASSWORD}
+    )
+    request(
+        'user-create', get_anonymous_client(), 'post', '/api/users/', {
+            'email': f'new{i}@example.com',
+            'username': f'new{i:04d}',
+            'first_name': 'Имя',
+            'last_name': 'Фамилия',
+            'password': PASSWORD,
+        }
+    )
+    response = request(
+        'token-login', get_anonymous_client(), 'post',
+        '/api/auth/token/login/',
+        {'email': user.email, 'password': PASSWORD}
+    )
+    client = get_client()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {response.data["auth_token"]}'
+    )
+    request('token-logout', client, 'post', '/api/auth/token/logout/')
+
+
+def call_recipe_writes(request, client, i):
+    data = {
+        'name': f'Рецепт {i}',
+        'text': 'Описание рецепта',
+        'cooking_time': 10,
+        'image': IMAGE,
+        'tags': list(Tag.objects.values_list('id', flat=True)[:2]),
+        'ingredients': [
+            {'id': pk, 'amount': amount}
+            for amount, pk in enumerate(
+                Ingredient.objects.values_list('id', flat=True)[:5], start=1
+            )
+        ],
+    }
+    response = request('recipe-create', client, 'post', '/api/recipes/', data)
+    url = f'/api/recipes/{response.data["id"]}/'
+    data['name'] = f'Рецепт {i} (изменён)'
+    request('recipe-update', client, 'patch', url, data)
+    request('recipe-delete', client, 'delete', url)
+
+
+@contextmanager
+def capture_queries(using=DEFAULT_DB_ALIAS):
+    """Собирает (sql, params) всех запросов к базе внутри блока."""
+    queries = []
+
+    def wrapper(execute, sql, params, many, context):
+        queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connections[using].execute_wrapper(wrapper):
+        yield queries
+
+
+SQLITE_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)(?! USING)(?:\s|$)')
+POSTGRES_SCAN = re.compile(r'Seq Scan on (\w+)(?: (\w+))?')
+# Псевдонимы таблиц в подзапросах и повторных JOIN: "recipes_cart" U0
+SQL_ALIAS = re.compile(r'"(\w+)" ([A-Z]\d+)\b')
+
+
+def explain(sql, params, using=DEFAULT_DB_ALIAS):
+    """План запроса строками текста."""
+    connection = connections[using]
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # Без последовательного чтения планировщик выберет индекс,
+            # если он вообще подходит: на маленьких тестовых таблицах
+            # иначе Seq Scan был бы выгоднее любого индекса
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}', params)
+            plan = [row[0] for row in cursor.fetchall()]
+            # Внутри внешней транзакции (TestCase) SET LOCAL действовал бы
+            # до её конца
+            cursor.execute('RESET enable_seqscan')
+            return plan
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def full_scans(sql, plan, using=DEFAULT_DB_ALIAS):
+    """Таблицы, которые читаются целиком, хотя запрос их фильтрует.
+
+    Полное чтение без условия по таблице (список тегов, первая страница
+    рецептов по первичному ключу) считается нормальным. Таблица под
+    псевдонимом (U0, T3) проверяется по условиям на этот псевдоним.
+    """
+    aliases = {alias: table for table, alias in SQL_ALIAS.findall(sql)}
+    where = sql.upper().partition(' WHERE ')[2]
+    tables = set()
+    for line in plan:
+        if connections[using].vendor == 'postgresql':
+            # PostgreSQL пишет таблицу и, если он есть, псевдоним
+            scans = [
+                alias.upper() if alias else table
+                for table, alias in POSTGRES_SCAN.findall(line)
+            ]
+        else:
+            scans = SQLITE_SCAN.findall(line)
+        for name in scans:
+            if name in aliases:
+                table, column = aliases[name], f'{name}."'
+            else:
+                table, column = name, f'"{name.upper()}".'
+            if column in where:
+                tables.add(table)
+    return tables
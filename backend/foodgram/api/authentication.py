@@ -0,0 +1,157 @@
+"""Аутентификация по токену с кэшем «токен → id пользователя».
+
+Первый уровень кэша — словарь в памяти процесса с ограниченным временем
+жизни записей, второй (по TOKEN_CACHE_SHARED) — общий кэш CACHES.
+Записи удаляются сигналами при удалении токена и изменении пользователя;
+в кэше других процессов запись живёт не дольше TOKEN_CACHE_TTL.
+
+Сам пользователь не кэшируется: иначе сохранение request.user записало бы
+в БД устаревшие поля, изменённые другим процессом.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.authtoken.models import Token
+
+from foodgram.settings import (TOKEN_CACHE_SHARED, TOKEN_CACHE_SIZE,
+                               TOKEN_CACHE_TTL, TOKEN_TTL)
+
+User = get_user_model()
+
+KEY = 'auth_token:{}'
+
+
+def token_expires_at(token):
+    """Момент истечения токена (time.time()) или None для бессрочных."""
+    if not TOKEN_TTL:
+        return None
+    return token.created.timestamp() + TOKEN_TTL
+
+
+def is_expired(token):
+    expires_at = token_expires_at(token)
+    return expires_at is not None and expires_at <= time.time()
+
+
+def expired_tokens():
+    """Токены с истёкшим сроком действия."""
+    if not TOKEN_TTL:
+        return Token.objects.none()
+    return Token.objects.filter(
+        created__lte=timezone.now() - timedelta(seconds=TOKEN_TTL)
+    )
+
+
+class TokenCache:
+    """Кэш «ключ токена → (id пользователя, создан)» с временем жизни."""
+
+    def __init__(self, size=TOKEN_CACHE_SIZE, shared=TOKEN_CACHE_SHARED):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.size = size
+        self.shared = shared
+
+    def get(self, key):
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is None and self.shared:
+            entry = cache.get(KEY.format(key))
+            if entry is not None:
+                self._store(key, entry)
+        if entry is None:
+            return None
+        expires_at, user_id, created = entry
+        if expires_at <= now:
+            self.evict(key)
+            return None
+        return user_id, created
+
+    def set(self, key, token):
+        expires_at = time.time() + TOKEN_CACHE_TTL
+        token_expiry = token_expires_at(token)
+        if token_expiry is not None:
+            expires_at = min(expires_at, token_expiry)
+        entry = (expires_at, token.user_id, token.created)
+        self._store(key, entry)
+        if self.shared:
+            cache.set(
+                KEY.format(key), entry,
+                timeout=max(int(expires_at - time.time()), 1)
+            )
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._entries.pop(key, None)
+            if len(self._entries) >= self.size:
+                # Словарь хранит порядок вставки: удаляем самую старую
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = entry
+
+    def evict(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+        if self.shared:
+            cache.delete_many([KEY.format(key) for key in keys])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запросов к БД для токенов из кэша.
+
+    Для безопасных методов пользователь из кэша — экземпляр только с id,
+    остальные поля загружаются из БД при первом обращении к любому из них.
+    Для изменяющих запросов пользователь всегда читается из БД целиком.
+    Токены старше TOKEN_TTL отклоняются и удаляются.
+    """
+
+    safe = False
+
+    def authenticate(self, request):
+        self.safe = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            user_id, created = cached
+            token = Token(key=key, user_id=user_id, created=created)
+            if self.safe:
+                user = User.from_db(User.objects.db, ['id'], [user_id])
+            else:
+                user = User.objects.filter(pk=user_id).first()
+                if user is None or not user.is_active:
+                    token_cache.evict(key)
+                    raise exceptions.AuthenticationFailed(
+                        'Пользователь неактивен или удалён.'
+                    )
+            token.user = user
+            return user, token
+        try:
+            token = Token.objects.select_related('user').get(key=key)
+        except Token.DoesNotExist:
+            raise exceptions.AuthenticationFailed('Недопустимый токен.')
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                'Пользователь неактивен или удалён.'
+            )
+        if is_expired(token):
+            token.delete()
+            raise exceptions.AuthenticationFailed(
+                'Срок действия токена истёк.'
+            )
+        token_cache.set(key, token)
+        return token.user, token
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Версии для ETag и лимиты запросов требуют общего кэша."""
+    if settings.CACHES['default']['BACKEND'] not in LOCAL_CACHES:
+        return []
+    return [Warning(
+        'Кэш default хранится в памяти процесса: у каждого воркера свои '
+        'счётчики версий для ETag и лимиты запросов, а вытеснение '
+        'записей сбрасывает лимиты.',
+        hint='Задайте CACHE_BACKEND и CACHE_LOCATION для memcached.',
+        id='api.W001',
+    )]
@@ -1,6 +1,43 @@
+from django.db.models import Case, IntegerField, Q, When
 from django_filters.rest_framework import FilterSet, filters
 
+from foodgram.settings import ITERATOR_CHUNK_SIZE, SEARCH_MAX_RESULTS
+from recipes.indexes import recipe_ingredient_index
 from recipes.models import Recipe, Tag
+from recipes.popularity import POPULAR_ORDERING
+from recipes.search import search_recipes
+
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
+
+
+def order_by_ids(queryset, ids):
+    """Оставляет рецепты из ids в порядке их следования в списке."""
+    if not ids:
+        return queryset.none()
+    return queryset.filter(id__in=ids).annotate(
+        position=Case(
+            *(When(id=pk, then=position) for position, pk in enumerate(ids)),
+            output_field=IntegerField(),
+        )
+    ).order_by('position')
+
+
+def matching_ids(queryset, ids):
+    """ids из индекса, которые проходят уже применённые фильтры queryset.
+
+    До SEARCH_MAX_RESULTS список обрезается только после пересечения,
+    иначе подходящие рецепты ниже общего топа терялись бы.
+    """
+    if queryset.query.where:
+        allowed = set(
+            queryset.order_by().values_list('id', flat=True).iterator(
+                chunk_size=ITERATOR_CHUNK_SIZE
+            )
+        )
+        ids = [pk for pk in ids if pk in allowed]
+    return ids[:SEARCH_MAX_RESULTS]
 
 
 class RecipeFilter(FilterSet):
@@ -17,6 +54,13 @@ class RecipeFilter(FilterSet):
     is_favorited = filters.BooleanFilter(
         method='filter_is_favorited'
     )
+    search = filters.CharFilter(method='filter_search')
+    has_ingredients = NumberInFilter(method='filter_has_ingredients')
+    can_cook_with = NumberInFilter(method='filter_can_cook_with')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'Популярные'),),
+        method='filter_ordering'
+    )
 
     class Meta:
         model = Recipe
@@ -33,3 +77,22 @@ class RecipeFilter(FilterSet):
         if value and not user.is_anonymous:
             return queryset.filter(favorites__author=user)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        found = search_recipes(queryset, value)
+        if found is None:
+            return queryset.filter(
+                Q(name__icontains=value) | Q(text__icontains=value)
+            )
+        return found
+
+    def filter_has_ingredients(self, queryset, name, value):
+        ids = recipe_ingredient_index.has_all(int(pk) for pk in value)
+        return order_by_ids(queryset, matching_ids(queryset, ids))
+
+    def filter_can_cook_with(self, queryset, name, value):
+        ids = recipe_ingredient_index.can_cook_with(int(pk) for pk in value)
+        return order_by_ids(queryset, matching_ids(queryset, ids))
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*POPULAR_ORDERING)
@@ -0,0 +1,166 @@
+import base64
+import binascii
+import hashlib
+import io
+import os
+import tempfile
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+from rest_framework import serializers
+
+from recipes.models import Recipe
+from foodgram.settings import (IMAGE_FORMATS, IMAGE_MAX_SIDE,
+                               IMAGE_MAX_UPLOAD_SIZE, IMAGE_RENDITIONS)
+from .storage import is_hashed_name
+
+# Длина куска base64 кратна 4, чтобы каждый кусок декодировался отдельно
+CHUNK_SIZE = 64 * 1024
+RENDITION_FORMAT = 'WEBP' if features.check('webp') else 'JPEG'
+RENDITION_EXTENSION = RENDITION_FORMAT.lower()
+# Поля с изображениями и нужные им уменьшенные копии
+IMAGE_FIELDS = {
+    Recipe: ('image', ('thumbnail', 'detail')),
+    get_user_model(): ('avatar', ('avatar',)),
+}
+
+
+def decode_base64(payload, destination):
+    """Декодирует base64 по частям в файл, возвращает sha256 и размер."""
+    digest = hashlib.sha256()
+    size = 0
+    for start in range(0, len(payload), CHUNK_SIZE):
+        try:
+            chunk = base64.b64decode(payload[start:start + CHUNK_SIZE])
+        except binascii.Error:
+            raise serializers.ValidationError('Некорректные данные base64.')
+        size += len(chunk)
+        if size > IMAGE_MAX_UPLOAD_SIZE:
+            raise serializers.ValidationError(
+                'Размер изображения не должен превышать '
+                f'{IMAGE_MAX_UPLOAD_SIZE // (1024 * 1024)} МБ.'
+            )
+        digest.update(chunk)
+        destination.write(chunk)
+    destination.seek(0)
+    return digest.hexdigest(), size
+
+
+def check_image_header(file):
+    """Проверяет формат и размеры по заголовку, не декодируя пиксели."""
+    try:
+        with Image.open(file) as image:
+            image_format, (width, height) = image.format, image.size
+    except UnidentifiedImageError:
+        raise serializers.ValidationError(
+            'Загрузите корректное изображение.'
+        )
+    file.seek(0)
+    if image_format not in IMAGE_FORMATS:
+        raise serializers.ValidationError(
+            f'Неподдерживаемый формат изображения: {image_format}.'
+        )
+    if max(width, height) > IMAGE_MAX_SIDE:
+        raise serializers.ValidationError(
+            'Сторона изображения не должна превышать '
+            f'{IMAGE_MAX_SIDE} пикселей.'
+        )
+    return image_format.lower()
+
+
+def rendition_name(name, rendition):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f'renditions/{stem}_{rendition}.{RENDITION_EXTENSION}'
+
+
+def create_renditions(name, renditions):
+    """Сохраняет уменьшенные копии, которых ещё нет в хранилище.
+
+    Вызывается после сохранения объекта: при ошибке валидации копии
+    не создаются.
+    """
+    if not is_hashed_name(name):
+        return
+    missing = [
+        rendition for rendition in renditions
+        if not default_storage.exists(rendition_name(name, rendition))
+    ]
+    if not missing:
+        return
+    with default_storage.open(name) as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert(
+            'RGBA' if RENDITION_FORMAT == 'WEBP' else 'RGB'
+        )
+        for rendition in missing:
+            copy = image.copy()
+            copy.thumbnail(IMAGE_RENDITIONS[rendition])
+            buffer = io.BytesIO()
+            copy.save(buffer, RENDITION_FORMAT, quality=85)
+            default_storage.save(
+                rendition_name(name, rendition),
+                ContentFile(buffer.getvalue())
+            )
+
+
+def ingest_base64_image(data):
+    """Превращает data URL во временный файл с именем-хешем."""
+    try:
+        payload = data.split(';base64,', 1)[1]
+    except IndexError:
+        raise serializers.ValidationError('Некорректный формат data URL.')
+    destination = tempfile.TemporaryFile()
+    digest, size = decode_base64(payload, destination)
+    extension = check_image_header(destination)
+    return File(destination, name=f'{digest}.{extension}')
+
+
+def rendition_urls(file, renditions, request=None):
+    """URL уменьшенных копий; для старых файлов — URL оригинала."""
+    if not file:
+        return None
+    urls = {}
+    for rendition in renditions:
+        if is_hashed_name(file.name):
+            url = default_storage.url(rendition_name(file.name, rendition))
+        else:
+            url = file.url
+        urls[rendition] = (
+            request.build_absolute_uri(url) if request is not None else url
+        )
+    return urls
+
+
+def orphan_images(min_age):
+    """Файлы с именем-хешем и их копии, на которые нет ссылок.
+
+    Файлы моложе min_age секунд пропускаются: объект, ссылающийся на
+    только что записанный файл, может быть ещё не сохранён.
+    """
+    stems = set()
+    for model, (field, _) in IMAGE_FIELDS.items():
+        stems.update(
+            os.path.splitext(os.path.basename(name))[0]
+            for name in model.objects.exclude(**{field: ''}).values_list(
+                field, flat=True
+            ).iterator()
+        )
+    deadline = timezone.now() - timedelta(seconds=min_age)
+    for directory in ('', 'renditions'):
+        if not default_storage.exists(directory):
+            continue
+        for filename in default_storage.listdir(directory)[1]:
+            name = os.path.join(directory, filename)
+            stem = os.path.splitext(filename)[0]
+            if directory:
+                stem = stem.rsplit('_', 1)[0]
+            if (
+                is_hashed_name(filename) and stem not in stems
+                and default_storage.get_modified_time(name) < deadline
+            ):
+                yield name
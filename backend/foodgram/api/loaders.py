@@ -0,0 +1,69 @@
+"""Связи текущего пользователя с объектами ответа.
+
+Поля is_subscribed, is_favorited и is_in_shopping_cart зависят от того,
+кто смотрит. Вместо запроса на каждый объект id объектов страницы
+собираются заранее (add), и каждая связь читается одним запросом с
+фильтром по этим id. Результаты хранятся на запросе.
+"""
+from recipes.models import Cart, Favourite
+from users.models import Follow
+
+ATTRIBUTE = '_viewer_relations'
+
+# Связь: модель, поле пользователя, поле объекта и вид id объекта
+RELATIONS = {
+    'following': (Follow, 'user', 'author_id', 'authors'),
+    'favorites': (Favourite, 'author', 'recipe_id', 'recipes'),
+    'cart': (Cart, 'author', 'recipe_id', 'recipes'),
+}
+
+
+class ViewerRelations:
+    """Подписки, избранное и корзина пользователя для объектов ответа."""
+
+    def __init__(self, user):
+        self.user = user
+        self._pending = {'authors': set(), 'recipes': set()}
+        self._known = {name: {} for name in RELATIONS}
+
+    def add(self, authors=(), recipes=()):
+        """Запоминает id, которые понадобятся при сериализации."""
+        self._pending['authors'].update(authors)
+        self._pending['recipes'].update(recipes)
+
+    def load(self, name, pk):
+        model, user_field, field, kind = RELATIONS[name]
+        known = self._known[name]
+        ids = {pk, *self._pending[kind]} - known.keys()
+        found = set()
+        if self.user.is_authenticated:
+            found = set(model.objects.filter(
+                **{user_field: self.user, f'{field}__in': ids}
+            ).order_by().values_list(field, flat=True))
+        known.update((id_, id_ in found) for id_ in ids)
+
+    def contains(self, name, pk):
+        if pk not in self._known[name]:
+            self.load(name, pk)
+        return self._known[name][pk]
+
+    def is_subscribed(self, author):
+        return self.contains('following', author.pk)
+
+    def is_favorited(self, recipe):
+        return self.contains('favorites', recipe.pk)
+
+    def is_in_shopping_cart(self, recipe):
+        return self.contains('cart', recipe.pk)
+
+
+def get_viewer_relations(request):
+    """ViewerRelations текущего пользователя, общие для всего запроса."""
+    # Храним на HttpRequest: DRF-запросы вложенных сериализаторов
+    # оборачивают один и тот же объект
+    http_request = getattr(request, '_request', request)
+    relations = getattr(http_request, ATTRIBUTE, None)
+    if relations is None or relations.user != request.user:
+        relations = ViewerRelations(request.user)
+        setattr(http_request, ATTRIBUTE, relations)
+    return relations
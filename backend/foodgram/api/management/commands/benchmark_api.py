@@ -0,0 +1,498 @@
+import base64
+import io
+import json
+import math
+import os
+import statistics
+import queue
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from itertools import cycle
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import (OperationalError, close_old_connections, connection,
+                       connections, transaction)
+from PIL import Image
+
+from api.audit import (IMAGE, MIN_RECIPES, PAGE_SIZES, call_reads,
+                       call_writes, capture_queries, get_client, seed,
+                       test_database, throttle_rates)
+from foodgram.settings import BASE_DIR, UPLOAD_THROTTLE_MIN_SIZE
+from recipes.models import Cart, Favourite, Ingredient, Recipe, Tag
+
+BASELINE = BASE_DIR / 'api' / 'benchmark_baseline.json'
+CASES = ('endpoints', 'recipe-create', 'throttling', 'mixed', 'connections')
+# Для этих замеров база нужна в файле: с ней работают несколько потоков
+# или соединение закрывается между запросами
+ON_DISK_CASES = ('throttling', 'mixed', 'connections')
+INGREDIENT_COUNTS = (1, 10, 30, 60)
+# Потоки, в которых один пользователь перегружает API
+ABUSERS = 6
+# limit_req для /api/ из infra/nginx.conf: запросов в секунду с одного
+# адреса и запас сверх этого
+PROXY_RATE = 10
+PROXY_BURST = 20
+# Доля чтений в смешанной нагрузке, остальное — переключение избранного
+# и корзины
+MIXED_READ_SHARE = 0.7
+
+
+def large_image(size=UPLOAD_THROTTLE_MIN_SIZE):
+    """PNG из случайных пикселей: почти не сжимается, поэтому весит больше
+    size и запрос с ним считается загрузкой изображения."""
+    side = math.isqrt(size // 3) + 1
+    image = Image.frombytes('RGB', (side, side), os.urandom(side * side * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(buffer.getvalue()).decode())
+
+
+class ProxyLimit:
+    """limit_req nginx с nodelay: ведро на PROXY_BURST + 1 запросов,
+    пополняется на PROXY_RATE в секунду."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tokens = PROXY_BURST + 1
+        self.updated_at = time.perf_counter()
+
+    def allow(self):
+        with self.lock:
+            now = time.perf_counter()
+            self.tokens = min(
+                PROXY_BURST + 1,
+                self.tokens + (now - self.updated_at) * PROXY_RATE
+            )
+            self.updated_at = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+def percentile(values, percent):
+    if len(values) < 2:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[
+        percent - 1
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Замеры API на тестовой базе. endpoints вызывает все маршруты '
+            'и сравнивает p50/p95 времени ответа и число SQL-запросов с '
+            'базовым JSON-файлом; recipe-create создаёт рецепты с разным '
+            'числом ингредиентов; throttling замеряет задержку списка '
+            'рецептов, пока другой пользователь перегружает API; mixed — '
+            'пропускную способность параллельных чтений и записей; '
+            'connections — задержку короткого запроса с учётом '
+            'CONN_MAX_AGE. Бюджеты запросов проверяет '
+            'api/tests/test_query_budget.py.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--case', choices=CASES, default='endpoints',
+            help='Что замерять.'
+        )
+        parser.add_argument(
+            '--baseline', default=str(BASELINE),
+            help='Путь к базовому JSON-файлу.'
+        )
+        parser.add_argument(
+            '--update', action='store_true',
+            help='Записать результаты в базовый файл.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Число замеров каждого маршрута.'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=500,
+            help='Число рецептов в тестовых данных, '
+                 f'не меньше {MIN_RECIPES}.'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=1.5,
+            help='Во сколько раз p95 может превысить базовое значение.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=2,
+            help='Число воркеров, обслуживающих запросы в throttling.'
+        )
+        parser.add_argument(
+            '--no-proxy-limit', action='store_true',
+            help='В throttling не ограничивать запросы на уровне nginx.'
+        )
+        parser.add_argument(
+            '--threads', type=int, default=4,
+            help='Число параллельных клиентов в mixed.'
+        )
+        parser.add_argument(
+            '--duration', type=float, default=6,
+            help='Длительность mixed в секундах.'
+        )
+
+    def handle(self, *args, **options):
+        if options['update'] and options['case'] != 'endpoints':
+            raise CommandError('--update есть только у --case endpoints.')
+        if options['recipes'] < MIN_RECIPES:
+            raise CommandError(
+                f'--recipes должно быть не меньше {MIN_RECIPES}: маршрут '
+                'recipe-list запрашивает вторую страницу при limit='
+                f'{max(PAGE_SIZES)}.'
+            )
+        self.samples = {}
+        with test_database(on_disk=options['case'] in ON_DISK_CASES):
+            self.users = seed(recipes=options['recipes'])
+            getattr(self, 'bench_' + options['case'].replace('-', '_'))(
+                options
+            )
+
+    def bench_endpoints(self, options):
+        with throttle_rates(user_read=None):
+            for i in range(options['repeat'] + 1):
+                # Первый проход прогревает кэши и индексы в памяти
+                self.warmup = i == 0
+                user = self.users[i % len(self.users)]
+                call_reads(self.request, user)
+                call_writes(self.request, user, i)
+        results = self.results()
+        try:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+        except FileNotFoundError:
+            baseline = None
+        self.report(results, options, baseline)
+        if options['update']:
+            with open(options['baseline'], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'vendor': connection.vendor,
+                    'recipes': options['recipes'],
+                    'repeat': options['repeat'],
+                    'endpoints': results,
+                }, file, ensure_ascii=False, indent=2)
+                file.write('\n')
+            self.stdout.write(f'Базовый файл обновлён: {options["baseline"]}')
+
+    def bench_recipe_create(self, options):
+        """Создание рецепта в зависимости от числа ингредиентов.
+
+        Число запросов не должно расти вместе с числом ингредиентов.
+        """
+        tags = list(Tag.objects.values_list('id', flat=True)[:2])
+        ingredient_ids = list(
+            Ingredient.objects.values_list('id', flat=True)[
+                :max(INGREDIENT_COUNTS)
+            ]
+        )
+        for i in range(options['repeat'] + 1):
+            self.warmup = i == 0
+            for j, count in enumerate(INGREDIENT_COUNTS):
+                # Пользователи чередуются, чтобы не сработал лимит записи
+                client = get_client(self.users[
+                    (i * len(INGREDIENT_COUNTS) + j) % len(self.users)
+                ])
+                response = self.request(
+                    f'recipe-create?ingredients={count}', client, 'post',
+                    '/api/recipes/', {
+                        'name': f'Рецепт {i}-{count}',
+                        'text': 'Описание рецепта',
+                        'cooking_time': 10,
+                        'image': IMAGE,
+                        'tags': tags,
+                        # Количество новое на каждом проходе, поэтому
+                        # строки ингредиентов создаются, а не находятся
+                        'ingredients': [
+                            {'id': pk, 'amount': i + 1}
+                            for pk in ingredient_ids[:count]
+                        ],
+                    }
+                )
+                client.delete(f'/api/recipes/{response.data["id"]}/')
+        self.report(self.results(), options)
+
+    def bench_throttling(self, options):
+        """Задержка списка рецептов, пока другой пользователь его перегружает.
+
+        Запросы выполняет пул из --workers потоков, как синхронные воркеры
+        gunicorn: запрос ждёт в очереди, пока воркеры заняты. Один
+        пользователь в ABUSERS потоках без пауз загружает большие картинки,
+        выгружает список покупок и запрашивает ?limit=10000. Его лишние
+        запросы должны получать 429, а задержка с учётом очереди у
+        остальных пользователей, которые открывают список по очереди, —
+        оставаться близкой к задержке без нагрузки. Запросы сверх
+        limit_req из nginx.conf отклоняются, не доходя до воркеров.
+        """
+        url = '/api/recipes/?limit=6'
+        clients = [get_client(user) for user in self.users[1:]]
+        self.tasks = queue.Queue()
+        workers = [
+            threading.Thread(target=self.serve)
+            for _ in range(options['workers'])
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            # Прогрев кэша токенов и индексов
+            for client in clients:
+                self.call(client, 'get', url)
+            idle = self.time_calls(clients, url, options['repeat'])
+            # У каждого потока свой счётчик ответов, без блокировок
+            statuses = [Counter() for _ in range(ABUSERS)]
+            stop = threading.Event()
+            # Все потоки нарушителя идут с одного адреса
+            proxy = None if options['no_proxy_limit'] else ProxyLimit()
+            abusers = [
+                threading.Thread(
+                    target=self.abuse,
+                    args=(self.users[0], stop, counter, proxy)
+                )
+                for counter in statuses
+            ]
+            for abuser in abusers:
+                abuser.start()
+            try:
+                busy = self.time_calls(clients, url, options['repeat'])
+            finally:
+                stop.set()
+                for abuser in abusers:
+                    abuser.join()
+        finally:
+            for _ in workers:
+                self.tasks.put(None)
+            for worker in workers:
+                worker.join()
+        for key, times in (('без нагрузки', idle), ('под нагрузкой', busy)):
+            self.stdout.write(
+                f'{"recipe-list " + key:45} '
+                f'p50 {statistics.median(times):8.2f} мс '
+                f'p95 {percentile(times, 95):8.2f} мс'
+            )
+        for (path, status), count in sorted(sum(statuses, Counter()).items()):
+            self.stdout.write(f'{path:45} ответ {status}: {count}')
+
+    def serve(self):
+        try:
+            while True:
+                task = self.tasks.get()
+                if task is None:
+                    return
+                future, client, method, url, data = task
+                if isinstance(data, bytes):
+                    extra = {'content_type': 'application/json'}
+                else:
+                    extra = {'format': 'json'}
+                try:
+                    response = getattr(client, method)(url, data, **extra)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                except Exception as error:
+                    future.set_exception(error)
+                else:
+                    future.set_result(response)
+        finally:
+            # Соединения потока иначе не дадут удалить тестовую базу
+            connections.close_all()
+
+    def call(self, client, method, url, data=None):
+        """Выполняет запрос в пуле воркеров и ждёт ответа."""
+        future = Future()
+        self.tasks.put((future, client, method, url, data))
+        return future.result()
+
+    def time_calls(self, clients, url, repeat):
+        times = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            response = self.call(clients[i % len(clients)], 'get', url)
+            times.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                raise CommandError(f'GET {url}: ответ {response.status_code}')
+        return times
+
+    def abuse(self, user, stop, statuses, proxy):
+        try:
+            client = get_client(user)
+            # Тело кодируется один раз: у настоящего клиента эта работа
+            # идёт на его машине, а не в воркерах сервера
+            recipe = json.dumps({
+                'name': 'Рецепт с большой картинкой',
+                'text': 'Описание рецепта',
+                'cooking_time': 10,
+                'image': large_image(),
+                'tags': list(Tag.objects.values_list('id', flat=True)[:1]),
+                'ingredients': [{
+                    'id': Ingredient.objects.values_list(
+                        'id', flat=True
+                    ).first(),
+                    'amount': 1,
+                }],
+            }).encode()
+            requests = cycle((
+                ('post', '/api/recipes/', recipe),
+                ('get', '/api/recipes/download_shopping_cart/', None),
+                ('get', '/api/recipes/?limit=10000', None),
+            ))
+            while not stop.is_set():
+                method, url, data = next(requests)
+                if proxy is not None and not proxy.allow():
+                    # Отказ nginx не стоит воркерам ничего; поток ждёт,
+                    # чтобы не занимать GIL вместо клиента на своей машине
+                    statuses[f'{method.upper()} {url}', 'nginx 429'] += 1
+                    stop.wait(1 / PROXY_RATE)
+                    continue
+                response = self.call(client, method, url, data)
+                statuses[
+                    f'{method.upper()} {url}', str(response.status_code)
+                ] += 1
+        finally:
+            connections.close_all()
+
+    def bench_mixed(self, options):
+        """Параллельные чтения и записи, как у воркеров gunicorn.
+
+        Каждый поток в цикле читает первую страницу рецептов или в
+        транзакции переключает рецепт в избранном или корзине: проверка,
+        затем вставка или удаление. Считаются операции в секунду, ошибки
+        «database is locked» и p99 задержки. Для сравнения с обычным
+        бэкендом SQLite команду запускают с SQLITE_TUNED=False, с
+        PostgreSQL — с POSTGRES_DB.
+        """
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        deadline = time.perf_counter() + options['duration']
+        stats = [
+            {'reads': 0, 'writes': 0, 'locked': 0, 'times': []}
+            for _ in range(options['threads'])
+        ]
+        threads = [
+            threading.Thread(target=self.mix, args=(
+                self.users[i % len(self.users)], recipe_ids, deadline,
+                stats[i], random.Random(i)
+            ))
+            for i in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        reads = sum(stat['reads'] for stat in stats)
+        writes = sum(stat['writes'] for stat in stats)
+        locked = sum(stat['locked'] for stat in stats)
+        times = [time for stat in stats for time in stat['times']]
+        self.stdout.write(
+            f'{connection.vendor} ({connection.settings_dict["ENGINE"]}), '
+            f'потоков {options["threads"]}: '
+            f'{reads / options["duration"]:.0f} чтений/с, '
+            f'{writes / options["duration"]:.0f} записей/с, '
+            f'ошибок блокировки {locked}, '
+            f'p99 {percentile(times, 99):.1f} мс'
+        )
+
+    def mix(self, user, recipe_ids, deadline, stat, rnd):
+        try:
+            client = get_client(user)
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                if rnd.random() < MIXED_READ_SHARE:
+                    client.get('/api/recipes/?limit=6')
+                    stat['reads'] += 1
+                else:
+                    model = rnd.choice((Cart, Favourite))
+                    recipe_id = rnd.choice(recipe_ids)
+                    try:
+                        with transaction.atomic():
+                            item = model.objects.filter(
+                                author=user, recipe_id=recipe_id
+                            )
+                            if item.exists():
+                                item.delete()
+                            else:
+                                model.objects.create(
+                                    author=user, recipe_id=recipe_id
+                                )
+                    except OperationalError as error:
+                        if 'locked' not in str(error):
+                            raise
+                        stat['locked'] += 1
+                        continue
+                    stat['writes'] += 1
+                stat['times'].append((time.perf_counter() - start) * 1000)
+        finally:
+            connections.close_all()
+
+    def bench_connections(self, options):
+        """Задержка короткого запроса с переподключением к базе и без него.
+
+        Тестовый клиент не закрывает соединения после ответа, поэтому
+        конец запроса здесь повторяется вызовом close_old_connections():
+        при CONN_MAX_AGE=0 каждый следующий запрос открывает соединение
+        заново. Значение задаётся переменной окружения CONN_MAX_AGE.
+        """
+        client = get_client(self.users[0])
+        for i in range(options['repeat'] + 1):
+            self.warmup = i == 0
+            self.request('tag-list', client, 'get', '/api/tags/')
+            close_old_connections()
+        self.stdout.write(
+            f'{connection.vendor}, CONN_MAX_AGE='
+            f'{connection.settings_dict["CONN_MAX_AGE"]}'
+        )
+        self.report(self.results(), options)
+
+    def results(self):
+        return {
+            key: {
+                'queries': max(sample['queries']),
+                'p50_ms': round(statistics.median(sample['times']), 2),
+                'p95_ms': round(percentile(sample['times'], 95), 2),
+            }
+            for key, sample in sorted(self.samples.items())
+        }
+
+    def request(self, key, client, method, url, data=None, **extra):
+        if method != 'get':
+            extra['format'] = 'json'
+        with capture_queries() as queries:
+            start = time.perf_counter()
+            response = getattr(client, method)(url, data, **extra)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = (time.perf_counter() - start) * 1000
+        if response.status_code >= 400:
+            raise CommandError(
+                f'{method.upper()} {url}: ответ {response.status_code}'
+            )
+        if not self.warmup:
+            sample = self.samples.setdefault(key, {'queries': [], 'times': []})
+            sample['queries'].append(len(queries))
+            sample['times'].append(elapsed)
+        return response
+
+    def report(self, results, options, baseline=None):
+        """Печатает результаты и отличия от базового файла, если он есть."""
+        if baseline is None:
+            baseline = {'endpoints': {}}
+        if baseline.get('vendor', connection.vendor) != connection.vendor:
+            self.stdout.write(self.style.WARNING(
+                f'Базовый файл снят на {baseline["vendor"]}, '
+                f'сейчас {connection.vendor}: время несравнимо.'
+            ))
+        for key, result in results.items():
+            old = baseline['endpoints'].get(key)
+            line = (f'{key:45} запросов {result["queries"]:3} '
+                    f'p50 {result["p50_ms"]:8.2f} мс '
+                    f'p95 {result["p95_ms"]:8.2f} мс')
+            style = None
+            if old is not None:
+                change = (result['p95_ms'] / old['p95_ms'] - 1) * 100
+                line += f' ({change:+.0f}% p95'
+                if result['queries'] != old['queries']:
+                    line += f', было {old["queries"]} запросов'
+                line += ')'
+                if result['p95_ms'] > old['p95_ms'] * options['tolerance']:
+                    style = self.style.WARNING
+            self.stdout.write(style(line) if style else line)
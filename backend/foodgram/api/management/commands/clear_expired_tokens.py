@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api.authentication import expired_tokens
+
+
+class Command(BaseCommand):
+    help = 'Удаляет токены авторизации старше TOKEN_TTL.'
+
+    def handle(self, *args, **options):
+        deleted, _ = expired_tokens().delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено токенов: {deleted}'
+        ))
@@ -0,0 +1,23 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from api.images import orphan_images
+
+
+class Command(BaseCommand):
+    help = 'Удаляет изображения и их копии, на которые нет ссылок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int, default=24 * 60 * 60,
+            help='Не трогать файлы моложе стольких секунд.'
+        )
+
+    def handle(self, *args, **options):
+        deleted = 0
+        for name in orphan_images(options['min_age']):
+            default_storage.purge(name)
+            deleted += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено файлов: {deleted}'
+        ))
@@ -0,0 +1,47 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+
+from .versions import get_versions
+
+
+class ConditionalGetMixin:
+    """ETag и ответ 304 для list и retrieve по счётчикам версий моделей.
+
+    Проверка выполняется до обращения к queryset и сериализатору.
+    """
+
+    etag_models = ()
+    etag_per_user = True
+
+    def get_etag(self, request):
+        parts = [
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            *get_versions(self.etag_models),
+        ]
+        if self.etag_per_user:
+            parts.append(request.user.pk)
+        return quote_etag(
+            hashlib.md5(repr(parts).encode()).hexdigest()
+        )
+
+    def conditional_get(self, handler, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if self.etag_per_user:
+                patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_get(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_get(
+            super().retrieve, request, *args, **kwargs
+        )
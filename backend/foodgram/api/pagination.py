@@ -1,10 +1,124 @@
-from rest_framework.pagination import LimitOffsetPagination
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import (CursorPagination, LimitOffsetPagination,
+                                       PageNumberPagination)
+
+from foodgram.settings import (MAX_PAGE_SIZE, PAGINATION_COUNT_CACHE_TTL,
+                               PAGINATION_COUNT_ESTIMATE_THRESHOLD)
+from .versions import VERSIONED_MODELS, get_versions
+
+
+def estimate_count(queryset):
+    """Оценка числа строк планировщиком PostgreSQL.
+
+    Возвращает None на других СУБД и для оценок ниже порога, чтобы
+    небольшие выборки считались точно.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    rows = int(plan[0]['Plan']['Plan Rows'])
+    return rows if rows >= PAGINATION_COUNT_ESTIMATE_THRESHOLD else None
+
+
+def cached_count(queryset):
+    """COUNT(*) с кэшированием по SQL запроса и версиям данных.
+
+    Параметры фильтров и id пользователя входят в SQL, поэтому ключ
+    различается для разных фильтров и пользователей; любое изменение
+    отслеживаемых моделей меняет версии и сбрасывает кэш. Считает по
+    основной базе: число с отстающей реплики сохранилось бы в кэше под
+    уже новыми версиями.
+    """
+    if not isinstance(queryset, QuerySet):
+        return len(queryset)
+    queryset = queryset.using(DEFAULT_DB_ALIAS)
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    key = 'count:' + hashlib.md5(repr(
+        (sql, params, get_versions(VERSIONED_MODELS))
+    ).encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = estimate_count(queryset)
+        if count is None:
+            count = queryset.count()
+        cache.set(key, count, PAGINATION_COUNT_CACHE_TTL)
+    return count
+
+
+class CachedCountPaginator(DjangoPaginator):
+
+    @cached_property
+    def count(self):
+        return cached_count(self.object_list)
+
+
+class CachedCountLimitOffsetPagination(LimitOffsetPagination):
+    max_limit = MAX_PAGE_SIZE
+
+    def get_count(self, queryset):
+        return cached_count(queryset)
 
 
 class FollowPagination(LimitOffsetPagination):
     page_size_query_param = 'recipes_limit'
 
 
+class RecipeCursorPagination(CursorPagination):
+    """Пагинация по ключу: страницы по -id без OFFSET и COUNT(*).
+
+    С другим порядком (популярные, релевантность поиска, покрытие
+    ингредиентов) возвращает 400: страницы по -id молча потеряли бы этот
+    порядок, а ключ по неуникальному рангу у CursorPagination держится на
+    смещении и ломается после offset_cutoff одинаковых значений.
+    """
+
+    ordering = '-id'
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = queryset.query.order_by or queryset.query.extra_order_by
+        if ordering and tuple(ordering) != (self.ordering,):
+            raise ValidationError({
+                'cursor': 'Пагинация по ключу недоступна с сортировкой '
+                          'ordering, search и фильтрами по ингредиентам.'
+            })
+        return super().paginate_queryset(queryset, request, view)
+
+
 class RecipePagination(PageNumberPagination):
+    """Постраничная пагинация; с параметром ?cursor= — по ключу."""
+
     page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+    cursor_query_param = 'cursor'
+    django_paginator_class = CachedCountPaginator
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.cursor_paginator = RecipeCursorPagination()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
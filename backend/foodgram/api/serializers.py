@@ -1,8 +1,7 @@
-import base64
-import uuid
-
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import (Manager, Prefetch, Q,
+                              prefetch_related_objects)
 from django.shortcuts import get_object_or_404
 from djoser.serializers import TokenCreateSerializer
 from djoser.serializers import UserCreateSerializer as BaseUserCreateSerializer
@@ -13,6 +12,8 @@ from recipes.models import (Cart, Favourite, Ingredient, IngredientForRecipe,
                             Recipe, Tag)
 from users.models import Follow
 from .exceptions import CustomValidation
+from .images import ingest_base64_image, rendition_urls
+from .loaders import get_viewer_relations
 from foodgram.settings import (MIN_AMOUNT, MAX_AMOUNT,
                                MAX_COOKING_TIME, MIN_COOKING_TIME)
 
@@ -23,68 +24,92 @@ User = get_user_model()
 class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(
-                base64.b64decode(imgstr), name=f'{uuid.uuid4()}.{ext}'
-            )
+            data = ingest_base64_image(data)
         return super().to_internal_value(data)
 
 
-class UserFollowSerializer(BaseUserSerializer):
-    email = serializers.EmailField(required=False)
-    is_subscribed = serializers.SerializerMethodField(read_only=True)
+class RenditionsField(serializers.Field):
+    """URL уменьшенных копий изображения, только для чтения."""
 
-    class Meta(BaseUserSerializer.Meta):
-        fields = (
-            'id', 'username', 'email',
-            'first_name', 'last_name', 'is_subscribed'
+    def __init__(self, renditions, **kwargs):
+        self.renditions = renditions
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return rendition_urls(
+            value, self.renditions, self.context.get('request')
+        )
+
+
+class ViewerRelationsListSerializer(serializers.ListSerializer):
+    """Список, который заранее передаёт id объектов в ViewerRelations."""
+
+    def to_representation(self, data):
+        if isinstance(data, Manager):
+            data = data.all()
+        data = list(data)
+        self.child.add_viewer_relations(
+            get_viewer_relations(self.context['request']), data
         )
+        return super().to_representation(data)
+
+
+class IsSubscribedMixin:
+    """Поле is_subscribed по подпискам текущего пользователя."""
+
+    def add_viewer_relations(self, relations, users):
+        relations.add(authors=(user.pk for user in users))
 
     def get_is_subscribed(self, obj):
-        user = obj.user
-        author = obj.author
-        if user.is_authenticated:
-            return user.followers.filter(author=author).exists()
-        return False
+        return get_viewer_relations(
+            self.context['request']
+        ).is_subscribed(obj)
+
 
+class FollowRecipesMixin:
+    """Поля recipes и recipes_count для карточки автора в подписках."""
 
-class UserReadFollowSerializer(BaseUserSerializer):
+    def get_recipes_limit(self):
+        try:
+            recipes_limit = int(self.context.get('recipes_limit'))
+        except (TypeError, ValueError):
+            return None
+        return recipes_limit if recipes_limit > 0 else None
+
+    def get_recipes(self, obj):
+        recipes = getattr(obj, 'limited_recipes', None)
+        if recipes is None:
+            recipes = obj.recipes.all()
+            recipes_limit = self.get_recipes_limit()
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
+        return RecipeShortSerializer(recipes, many=True).data
+
+    def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
+        return obj.recipes.count()
+
+
+class UserReadFollowSerializer(IsSubscribedMixin, FollowRecipesMixin,
+                               BaseUserSerializer):
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
     avatar = Base64ImageField(max_length=None, use_url=True)
+    avatar_renditions = RenditionsField(
+        renditions=('avatar',), source='avatar'
+    )
     email = serializers.EmailField(required=False)
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
     class Meta(BaseUserSerializer.Meta):
         fields = (
             'id', 'username', 'email',
-            'first_name', 'last_name', 'is_subscribed', 'avatar', 'recipes',
-            'recipes_count'
+            'first_name', 'last_name', 'is_subscribed', 'avatar',
+            'avatar_renditions', 'recipes', 'recipes_count'
         )
-
-    def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        author = obj
-        if user.is_authenticated:
-            return user.followers.filter(author=author).exists()
-        return False
-
-    def get_recipes(self, obj):
-        recipes = obj.recipes.all()
-        return RecipeShortSerializer(recipes, many=True).data
-
-    def get_recipes_count(self, obj):
-        return obj.recipes.all().count()
-
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        recipes_limit = self.context.get('recipes_limit', None)
-
-        if recipes_limit:
-            representation['recipes'] = (representation['recipes']
-                                         [:int(recipes_limit)])
-        return representation
+        list_serializer_class = ViewerRelationsListSerializer
 
 
 class CustomUserCreateSerializer(BaseUserCreateSerializer):
@@ -106,8 +131,11 @@ class AvatarUserSerializer(serializers.ModelSerializer):
         fields = ('avatar',)
 
 
-class UserSerializer(BaseUserSerializer):
+class UserSerializer(IsSubscribedMixin, BaseUserSerializer):
     avatar = Base64ImageField(max_length=None, use_url=True)
+    avatar_renditions = RenditionsField(
+        renditions=('avatar',), source='avatar'
+    )
     email = serializers.EmailField(required=False)
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
@@ -115,20 +143,18 @@ class UserSerializer(BaseUserSerializer):
         fields = (
             'email', 'id', 'username',
             'first_name', 'last_name', 'is_subscribed',
-            'avatar',
+            'avatar', 'avatar_renditions',
         )
-
-    def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        if user.is_authenticated:
-            return user.followers.filter(author=obj).exists()
-        return False
+        list_serializer_class = ViewerRelationsListSerializer
 
 
-class FollowUserSerializer(BaseUserSerializer):
+class FollowUserSerializer(FollowRecipesMixin, BaseUserSerializer):
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
     avatar = Base64ImageField(max_length=None, use_url=True)
+    avatar_renditions = RenditionsField(
+        renditions=('avatar',), source='avatar'
+    )
     email = serializers.EmailField(required=False)
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
@@ -136,7 +162,7 @@ class FollowUserSerializer(BaseUserSerializer):
         fields = (
             'email', 'id', 'username',
             'first_name', 'last_name', 'is_subscribed',
-            'avatar', 'recipes', 'recipes_count'
+            'avatar', 'avatar_renditions', 'recipes', 'recipes_count'
         )
 
     def get_is_subscribed(self, obj):
@@ -145,33 +171,18 @@ class FollowUserSerializer(BaseUserSerializer):
             raise serializers.ValidationError(
                 {'detail': 'Вы не можете подписаться на самого себя.'}
             )
-        if user.is_authenticated:
-            if user.followers.filter(author=obj).exists():
-                raise serializers.ValidationError(
-                    {f'{obj}': 'Вы уже подписаны на этого пользователя.'}
-                )
-            return user.followers.filter(author=obj).exists()
+        if get_viewer_relations(self.context['request']).is_subscribed(obj):
+            raise serializers.ValidationError(
+                {f'{obj}': 'Вы уже подписаны на этого пользователя.'}
+            )
         return False
 
-    def get_recipes(self, obj):
-        recipes = obj.recipes.all()
-        return RecipeShortSerializer(recipes, many=True).data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.all().count()
-
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        recipes_limit = self.context.get('recipes_limit', None)
-
-        if recipes_limit:
-            representation['recipes'] = (representation['recipes']
-                                         [:int(recipes_limit)])
-        return representation
-
-
-class UserReadSerializer(BaseUserSerializer):
+class UserReadSerializer(IsSubscribedMixin, BaseUserSerializer):
     avatar = Base64ImageField(max_length=None, use_url=True)
+    avatar_renditions = RenditionsField(
+        renditions=('avatar',), source='avatar'
+    )
     email = serializers.EmailField(required=False)
     is_subscribed = serializers.SerializerMethodField(read_only=True)
 
@@ -180,17 +191,12 @@ class UserReadSerializer(BaseUserSerializer):
         fields = (
             'email', 'id', 'username',
             'first_name', 'last_name', 'is_subscribed',
-            'avatar',
+            'avatar', 'avatar_renditions',
         )
-
-    def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        if user.is_authenticated:
-            return user.followers.filter(author=obj).exists()
-        return False
+        list_serializer_class = ViewerRelationsListSerializer
 
 
-class FollowSerializer(UserSerializer):
+class FollowSerializer(FollowRecipesMixin, UserSerializer):
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
 
@@ -204,13 +210,6 @@ class FollowSerializer(UserSerializer):
             )
         ]
 
-    def get_recipes(self, obj):
-        recipes = obj.recipes.all()
-        return RecipeShortSerializer(recipes, many=True).data
-
-    def get_recipes_count(self, obj):
-        return obj.recipes.all().count()
-
     def validate(self, data):
         requset = self.context['request']
         author_id = requset.parser_context['kwargs']['user_id']
@@ -220,14 +219,6 @@ class FollowSerializer(UserSerializer):
             )
         return data
 
-    def to_representation(self, instance):
-        representation = super().to_representation(instance)
-        recipes_limit = self.context.get('recipes_limit', None)
-        if recipes_limit:
-            representation['recipes'] = (representation['recipes']
-                                         [:recipes_limit])
-        return representation
-
 
 class TagSerializer(serializers.ModelSerializer):
 
@@ -252,7 +243,7 @@ class IngredientNotAmountSerializer(serializers.ModelSerializer):
 
 class IngredientForCreateRecipe(serializers.ModelSerializer):
 
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     amount = serializers.IntegerField(
         min_value=MIN_AMOUNT, max_value=MAX_AMOUNT
     )
@@ -285,22 +276,34 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     ingredients = IngredientReadSerilizer(many=True, read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
+    image_renditions = RenditionsField(
+        renditions=('thumbnail', 'detail'), source='image'
+    )
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'name', 'author', 'text', 'tags', 'ingredients',
-            'is_in_shopping_cart', 'is_favorited', 'cooking_time', 'image'
+            'is_in_shopping_cart', 'is_favorited', 'cooking_time', 'image',
+            'image_renditions', 'favorites_count', 'carts_count'
+        )
+        list_serializer_class = ViewerRelationsListSerializer
+
+    def add_viewer_relations(self, relations, recipes):
+        relations.add(
+            authors=(recipe.author_id for recipe in recipes),
+            recipes=(recipe.pk for recipe in recipes),
         )
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context['request'].user
-        return user.is_authenticated and user.carts.filter(recipe=obj).exists()
+        return get_viewer_relations(
+            self.context['request']
+        ).is_in_shopping_cart(obj)
 
     def get_is_favorited(self, obj):
-        user = self.context['request'].user
-        return user.is_authenticated and user.favorites.filter(
-            recipe=obj).exists()
+        return get_viewer_relations(
+            self.context['request']
+        ).is_favorited(obj)
 
 
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
@@ -323,16 +326,73 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             'cooking_time', 'image'
         )
 
+    def find_ingredient_lines(self, pairs):
+        condition = Q()
+        for ingredient_id, amount in pairs:
+            condition |= Q(ingredient_id=ingredient_id, amount=amount)
+        return {
+            (ingredient_id, amount): pk
+            for pk, ingredient_id, amount in (
+                IngredientForRecipe.objects.filter(condition).values_list(
+                    'id', 'ingredient_id', 'amount'
+                )
+            )
+        }
+
+    def get_ingredient_lines(self, pairs):
+        lines = self.find_ingredient_lines(pairs)
+        missing = pairs - lines.keys()
+        if missing:
+            created = IngredientForRecipe.objects.bulk_create(
+                IngredientForRecipe(ingredient_id=ingredient_id, amount=amount)
+                for ingredient_id, amount in missing
+            )
+            if all(line.pk for line in created):
+                lines.update(
+                    ((line.ingredient_id, line.amount), line.pk)
+                    for line in created
+                )
+            else:
+                lines.update(self.find_ingredient_lines(missing))
+        return list(lines.values())
+
+    def get_ingredient_pairs(self, ingredients_data):
+        return {
+            (ingredient['id'], ingredient['amount'])
+            for ingredient in ingredients_data
+        }
+
     def create_ingredients(self, recipe, ingredients_data):
-        for ingredient_data in ingredients_data:
-            ing, created = IngredientForRecipe.objects.get_or_create(
-                ingredient=get_object_or_404(
-                    Ingredient.objects.filter(id=ingredient_data['id'].id)
-                ),
-                amount=ingredient_data['amount'],
+        recipe.ingredients.add(*self.get_ingredient_lines(
+            self.get_ingredient_pairs(ingredients_data)
+        ))
+
+    def update_tags(self, recipe, tags_data):
+        current = set(recipe.tags.values_list('id', flat=True))
+        submitted = {tag.id for tag in tags_data}
+        if current - submitted:
+            recipe.tags.remove(*(current - submitted))
+        if submitted - current:
+            recipe.tags.add(*(submitted - current))
+
+    def update_ingredients(self, recipe, ingredients_data):
+        current = {
+            (ingredient_id, amount): pk
+            for pk, ingredient_id, amount in recipe.ingredients.values_list(
+                'id', 'ingredient_id', 'amount'
             )
-            recipe.ingredients.add(ing.id)
+        }
+        submitted = self.get_ingredient_pairs(ingredients_data)
+        removed = [
+            pk for pair, pk in current.items() if pair not in submitted
+        ]
+        if removed:
+            recipe.ingredients.remove(*removed)
+        added = submitted - current.keys()
+        if added:
+            recipe.ingredients.add(*self.get_ingredient_lines(added))
 
+    @transaction.atomic
     def create(self, validated_data):
         tags_data = validated_data.pop('tags')
         ingredients_data = validated_data.pop('ingredients')
@@ -341,14 +401,23 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         self.create_ingredients(recipe, ingredients_data)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        tags_data = validated_data.pop('tags')
-        ingredients_data = validated_data.pop('ingredients')
-        instance.tags.clear()
-        instance.tags.set(tags_data)
-        instance.ingredients.clear()
-        self.create_ingredients(instance, ingredients_data)
-        return super().update(instance, validated_data)
+        tags_data = validated_data.pop('tags', None)
+        ingredients_data = validated_data.pop('ingredients', None)
+        if tags_data is not None:
+            self.update_tags(instance, tags_data)
+        if ingredients_data is not None:
+            self.update_ingredients(instance, ingredients_data)
+        changed_fields = [
+            field for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        for field in changed_fields:
+            setattr(instance, field, validated_data[field])
+        if changed_fields:
+            instance.save(update_fields=changed_fields)
+        return instance
 
     def validate_ingredients(self, value):
         if not value:
@@ -360,6 +429,16 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 {'ingredients': 'Ингредиенты не могут повторяться'}
             )
+        missing = set(ingredients) - set(
+            Ingredient.objects.filter(id__in=ingredients).values_list(
+                'id', flat=True
+            )
+        )
+        if missing:
+            raise serializers.ValidationError(
+                {'ingredients': 'Ингредиенты не найдены: '
+                 f'{", ".join(map(str, sorted(missing)))}'}
+            )
         return value
 
     def validate_tags(self, value):
@@ -374,23 +453,28 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         return value
 
     def validate(self, data):
-        if not data.get('text'):
-            raise serializers.ValidationError(
-                {'text': 'Отсутствует поле'}
-            )
-        if not data.get('ingredients'):
-            raise serializers.ValidationError(
-                {'ingredients': 'Отсутствует поле'}
-            )
-        if not data.get('tags'):
-            raise serializers.ValidationError(
-                {'tags': 'Отсутствует поле'}
-            )
+        for field in ('text', 'ingredients', 'tags'):
+            if self.partial and field not in data:
+                continue
+            if not data.get(field):
+                raise serializers.ValidationError(
+                    {field: 'Отсутствует поле'}
+                )
         return data
 
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
+        prefetch_related_objects(
+            [instance],
+            'tags',
+            Prefetch(
+                'ingredients',
+                queryset=IngredientForRecipe.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        )
         return RecipeReadSerializer(instance, context=context).data
 
 
@@ -413,6 +497,9 @@ class TokenSerializer(TokenCreateSerializer):
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
+    image_renditions = RenditionsField(
+        renditions=('thumbnail',), source='image'
+    )
 
     class Meta:
         model = Recipe
@@ -420,6 +507,7 @@ class RecipeShortSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'image_renditions',
             'cooking_time'
         )
 
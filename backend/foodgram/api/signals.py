@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, Recipe
+from recipes.signals import ingredients_imported
+from .authentication import token_cache
+from .images import IMAGE_FIELDS, create_renditions
+from .versions import VERSIONED_MODELS, bump
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_model_version(sender, **kwargs):
+    if sender in VERSIONED_MODELS:
+        bump(sender)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_recipe_version(sender, action, **kwargs):
+    if action.startswith('post_'):
+        bump(Recipe)
+
+
+@receiver(ingredients_imported)
+def bump_ingredient_version(sender, **kwargs):
+    bump(Ingredient)
+
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+    token_cache.evict(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def evict_user_tokens(sender, instance, created, **kwargs):
+    if not created:
+        token_cache.evict(*Token.objects.filter(
+            user=instance
+        ).values_list('key', flat=True))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=get_user_model())
+def create_image_renditions(sender, instance, update_fields=None, **kwargs):
+    field, renditions = IMAGE_FIELDS[sender]
+    if update_fields is not None and field not in update_fields:
+        return
+    name = getattr(instance, field).name
+    if name:
+        transaction.on_commit(lambda: create_renditions(name, renditions))
@@ -0,0 +1,56 @@
+import os
+import re
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+
+HASHED_NAME = re.compile(r'^[0-9a-f]{64}(_\w+)?\.\w+$')
+
+
+def is_hashed_name(name):
+    return bool(HASHED_NAME.match(os.path.basename(name)))
+
+
+class ContentHashStorage(FileSystemStorage):
+    """Файловое хранилище с дедупликацией по хешу содержимого.
+
+    Файл, имя которого — sha256 содержимого, сохраняется только один раз;
+    повторная загрузка возвращает уже существующее имя. Такие файлы могут
+    использоваться несколькими объектами, поэтому delete() их не удаляет:
+    неиспользуемые файлы удаляет команда clear_orphan_images.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        if is_hashed_name(name):
+            return name
+        return super().get_available_name(name, max_length)
+
+    def _save(self, name, content):
+        if not is_hashed_name(name):
+            return super()._save(name, content)
+        if self.exists(name):
+            # Обновляем время изменения: сборщик мусора не тронет файл,
+            # пока ссылающийся на него объект ещё не сохранён
+            os.utime(self.path(name))
+            return name
+        # Пишем под временным именем и публикуем жёсткой ссылкой. Если
+        # параллельная загрузка успела раньше, FileExistsError значит, что
+        # файл с тем же содержимым уже на месте. Родительский _save на
+        # FileExistsError запрашивает новое имя и для хешированного имени
+        # получал бы то же самое бесконечно
+        temp_name = super()._save(f'{name}.{uuid.uuid4().hex}.tmp', content)
+        try:
+            os.link(self.path(temp_name), self.path(name))
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(self.path(temp_name))
+        return name
+
+    def delete(self, name):
+        if not is_hashed_name(name):
+            super().delete(name)
+
+    def purge(self, name):
+        """Удаляет файл и с именем-хешем: только для сборки мусора."""
+        super().delete(name)
@@ -0,0 +1,66 @@
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.audit import IMAGE
+from api.authentication import token_cache
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class CachedTokenAuthenticationTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.user = User.objects.create_user(
+            username='cooker', email='cooker@example.com',
+            password='password', first_name='Иван'
+        )
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def change_in_other_process(self):
+        # queryset.update() не вызывает сигналов, как и запись из другого
+        # процесса, который не может очистить локальный кэш этого
+        User.objects.filter(pk=self.user.pk).update(
+            first_name='Пётр', password=make_password('new-password')
+        )
+
+    def test_safe_request_reads_current_fields(self):
+        self.client.get('/api/users/me/')
+        self.change_in_other_process()
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.data['first_name'], 'Пётр')
+
+    def test_write_does_not_restore_stale_fields(self):
+        self.client.get('/api/users/me/')
+        self.change_in_other_process()
+        response = self.client.put(
+            '/api/users/me/avatar/', {'avatar': IMAGE}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Пётр')
+        self.assertTrue(self.user.check_password('new-password'))
+
+    def test_cached_token_skips_auth_queries(self):
+        self.client.get('/api/ingredients/?name=соль')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/ingredients/?name=соль')
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,131 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from recipes.indexes import recipe_ingredient_index
+from recipes.models import Ingredient, IngredientForRecipe, Recipe, Tag
+
+User = get_user_model()
+
+
+class RecipeSearchTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com'
+        )
+        other = User.objects.create_user(
+            username='other', email='other@example.com'
+        )
+        soup = Tag.objects.create(name='Супы', slug='soup')
+        lunch = Tag.objects.create(name='Обед', slug='lunch')
+        # Рецепты автора ниже всех по релевантности: слово только в описании
+        for i in range(4):
+            recipe = Recipe.objects.create(
+                name=f'Суп {i}', text='Почти как борщ, но суп.',
+                author=cls.author, cooking_time=10
+            )
+            recipe.tags.set([soup, lunch])
+        for i in range(20):
+            Recipe.objects.create(
+                name=f'Борщ {i}', text='Борщ со сметаной.',
+                author=other, cooking_time=10
+            )
+        Recipe.objects.create(
+            name='Салат', text='Без свёклы.', author=cls.author,
+            cooking_time=5
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_search_ranks_name_matches_first(self):
+        response = self.client.get('/api/recipes/?search=борщ&limit=100')
+        self.assertEqual(response.data['count'], 24)
+        names = [recipe['name'] for recipe in response.data['results']]
+        self.assertTrue(all(name.startswith('Борщ') for name in names[:20]))
+
+    def test_search_combined_with_author(self):
+        response = self.client.get(
+            f'/api/recipes/?search=борщ&author={self.author.pk}'
+        )
+        self.assertEqual(response.data['count'], 4)
+        self.assertEqual(
+            {recipe['name'] for recipe in response.data['results']},
+            {f'Суп {i}' for i in range(4)}
+        )
+
+    def test_search_combined_with_tags(self):
+        response = self.client.get(
+            '/api/recipes/?search=борщ&tags=soup&tags=lunch'
+        )
+        self.assertEqual(response.data['count'], 4)
+
+
+@mock.patch('api.filters.SEARCH_MAX_RESULTS', 5)
+class RecipeIngredientFilterTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com'
+        )
+        cls.other = User.objects.create_user(
+            username='other', email='other@example.com'
+        )
+        lines = [
+            IngredientForRecipe.objects.create(
+                ingredient=Ingredient.objects.create(
+                    name=name, measurement_unit='г'
+                ),
+                amount=1
+            )
+            for name in ('соль', 'мука', 'яйцо', 'молоко')
+        ]
+        cls.ids = ','.join(str(line.ingredient_id) for line in lines)
+        cls.salt = lines[0].ingredient_id
+        # У автора рецепты из всех ингредиентов, у другого — только соль
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                name=f'Блины {i}', text='Блины', author=cls.author,
+                cooking_time=10
+            )
+            recipe.ingredients.set(lines)
+        for i in range(5):
+            recipe = Recipe.objects.create(
+                name=f'Соль {i}', text='Соль', author=cls.other,
+                cooking_time=1
+            )
+            recipe.ingredients.set(lines[:1])
+
+    def setUp(self):
+        cache.clear()
+        recipe_ingredient_index.invalidate()
+        self.client = APIClient()
+
+    def test_has_ingredients_combined_with_author(self):
+        # Рецепты автора ниже рецептов из одной соли и не входят в топ-5
+        response = self.client.get(
+            f'/api/recipes/?has_ingredients={self.salt}'
+            f'&author={self.author.pk}'
+        )
+        self.assertEqual(response.data['count'], 3)
+
+    def test_can_cook_with_combined_with_author(self):
+        response = self.client.get(
+            f'/api/recipes/?can_cook_with={self.ids}&author={self.other.pk}'
+        )
+        self.assertEqual(response.data['count'], 5)
+
+    def test_result_limit_applies_after_filters(self):
+        response = self.client.get(f'/api/recipes/?can_cook_with={self.ids}')
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(
+            [recipe['name'] for recipe in response.data['results'][:3]],
+            ['Блины 2', 'Блины 1', 'Блины 0']
+        )
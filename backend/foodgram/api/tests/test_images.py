@@ -0,0 +1,110 @@
+import io
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.audit import IMAGE
+from api.images import rendition_name
+from recipes.models import Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def stored_files():
+    return {
+        os.path.relpath(os.path.join(root, filename), TEMP_MEDIA_ROOT)
+        for root, _, filenames in os.walk(TEMP_MEDIA_ROOT)
+        for filename in filenames
+    }
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageRenditionsTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cooker', email='cooker@example.com'
+        )
+        cls.tag = Tag.objects.create(name='Завтрак', slug='breakfast')
+        cls.ingredient = Ingredient.objects.create(
+            name='мука', measurement_unit='г'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        self.client = APIClient()
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def create_recipe(self, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/recipes/', {
+                'name': 'Блины',
+                'text': 'Блины',
+                'cooking_time': 10,
+                'image': IMAGE,
+                'tags': [self.tag.pk],
+                'ingredients': [{'id': self.ingredient.pk, 'amount': 100}],
+                **data
+            }, format='json')
+
+    def test_failed_validation_writes_no_files(self):
+        response = self.create_recipe(cooking_time=0)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(stored_files(), set())
+
+    def test_recipe_gets_recipe_renditions(self):
+        response = self.create_recipe()
+        self.assertEqual(response.status_code, 201)
+        name = Recipe.objects.get().image.name
+        self.assertEqual(stored_files(), {
+            name,
+            rendition_name(name, 'thumbnail'),
+            rendition_name(name, 'detail'),
+        })
+
+    def test_avatar_gets_avatar_rendition(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(
+                '/api/users/me/avatar/', {'avatar': IMAGE}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        name = self.user.avatar.name
+        self.assertEqual(
+            stored_files(), {name, rendition_name(name, 'avatar')}
+        )
+
+    def test_clear_orphan_images(self):
+        self.create_recipe()
+        used = stored_files()
+        orphan = default_storage.save(f'{"0" * 64}.png', ContentFile(b'x'))
+        default_storage.save(
+            rendition_name(orphan, 'thumbnail'), ContentFile(b'x')
+        )
+        legacy = default_storage.save('legacy.png', ContentFile(b'x'))
+        # Свежие файлы не удаляются: ссылка на них может появиться позже
+        call_command('clear_orphan_images', stdout=io.StringIO())
+        self.assertEqual(len(stored_files()), len(used) + 3)
+        call_command(
+            'clear_orphan_images', min_age=-1, stdout=io.StringIO()
+        )
+        self.assertEqual(stored_files(), used | {legacy})
@@ -0,0 +1,130 @@
+from unittest import mock, skipIf
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.pagination import (RecipeCursorPagination, cached_count,
+                            estimate_count)
+from recipes.indexes import recipe_ingredient_index
+from recipes.models import Ingredient, IngredientForRecipe, Recipe
+
+User = get_user_model()
+
+
+class RecipeCursorPaginationTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@example.com'
+        )
+        cls.line = IngredientForRecipe.objects.create(
+            ingredient=Ingredient.objects.create(
+                name='свёкла', measurement_unit='г'
+            ),
+            amount=1
+        )
+        for i in range(5):
+            recipe = Recipe.objects.create(
+                name=f'Борщ {i}', text='Борщ', author=author, cooking_time=10
+            )
+            recipe.ingredients.set([cls.line])
+
+    def setUp(self):
+        cache.clear()
+        recipe_ingredient_index.invalidate()
+        self.client = APIClient()
+
+    def test_cursor_pages_by_id(self):
+        response = self.client.get('/api/recipes/?cursor=&limit=2')
+        self.assertEqual(response.status_code, 200)
+        ids = [recipe['id'] for recipe in response.data['results']]
+        response = self.client.get(response.data['next'])
+        ids += [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+        self.assertEqual(len(set(ids)), 4)
+
+    def test_cursor_rejects_ranked_ordering(self):
+        ingredient = self.line.ingredient_id
+        for query in ('ordering=popular', 'search=борщ',
+                      f'can_cook_with={ingredient}',
+                      f'has_ingredients={ingredient}'):
+            with self.subTest(query=query):
+                response = self.client.get(f'/api/recipes/?{query}&cursor=')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cursor', response.data)
+
+    def paginate(self, queryset):
+        request = Request(APIRequestFactory().get('/api/recipes/?limit=2'))
+        return RecipeCursorPagination().paginate_queryset(queryset, request)
+
+    def test_cursor_accepts_only_id_ordering(self):
+        self.assertEqual(len(self.paginate(Recipe.objects.order_by('-id'))), 2)
+        for ordering in (('id',), ('-cooking_time',), ('name', '-id')):
+            with self.subTest(ordering=ordering):
+                with self.assertRaises(ValidationError):
+                    self.paginate(Recipe.objects.order_by(*ordering))
+
+
+class CachedCountTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com'
+        )
+        for i in range(3):
+            Recipe.objects.create(
+                name=f'Борщ {i}', text='Борщ', author=cls.author,
+                cooking_time=10 + i
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_count_cached_until_write(self):
+        queryset = Recipe.objects.all()
+        self.assertEqual(cached_count(queryset), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_count(Recipe.objects.all()), 3)
+        Recipe.objects.create(
+            name='Щи', text='Щи', author=self.author, cooking_time=10
+        )
+        self.assertEqual(cached_count(Recipe.objects.all()), 4)
+
+    def test_key_depends_on_filters(self):
+        self.assertEqual(cached_count(Recipe.objects.all()), 3)
+        self.assertEqual(
+            cached_count(Recipe.objects.filter(cooking_time__gt=10)), 2
+        )
+        self.assertEqual(cached_count(Recipe.objects.none()), 0)
+
+    def test_small_estimate_falls_back_to_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(cached_count(Recipe.objects.all()), 3)
+        self.assertTrue(any(
+            'COUNT(' in query['sql'] for query in queries.captured_queries
+        ))
+
+    @skipIf(connection.vendor == 'postgresql', 'Оценка есть в PostgreSQL')
+    def test_no_estimate_on_other_databases(self):
+        with mock.patch('api.pagination.PAGINATION_COUNT_ESTIMATE_THRESHOLD',
+                        0):
+            self.assertIsNone(estimate_count(Recipe.objects.all()))
+
+    @skipIf(connection.vendor != 'postgresql', 'Только для PostgreSQL')
+    def test_large_estimate_replaces_count(self):
+        with mock.patch('api.pagination.PAGINATION_COUNT_ESTIMATE_THRESHOLD',
+                        0):
+            with CaptureQueriesContext(connection) as queries:
+                count = cached_count(Recipe.objects.all())
+        sql = [query['sql'] for query in queries.captured_queries]
+        self.assertEqual(len(sql), 1)
+        self.assertTrue(sql[0].startswith('EXPLAIN'))
+        self.assertIsInstance(count, int)
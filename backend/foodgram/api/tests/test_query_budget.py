@@ -0,0 +1,126 @@
+import shutil
+import tempfile
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from api.audit import (call_reads, call_writes, capture_queries, seed,
+                       throttle_rates)
+from recipes.indexes import recipe_ingredient_index
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+# Предельное число SQL-запросов на один вызов маршрута, с учётом
+# промаха кэша токенов и оценки COUNT(*) на PostgreSQL.
+# Не зависит от размера страницы: рост числа запросов вместе с limit —
+# это N+1
+QUERY_BUDGETS = {
+    'recipe-list': 9,
+    'recipe-list-tags': 9,
+    'recipe-list-author': 9,
+    'recipe-list-favorited': 8,
+    'recipe-list-cart': 8,
+    'recipe-list-search': 9,
+    'recipe-list-has-ingredients': 8,
+    'recipe-list-can-cook-with': 8,
+    'recipe-list-popular': 8,
+    'recipe-list-cursor': 6,
+    'recipe-top': 6,
+    'recipe-feed': 7,
+    'recipe-detail': 6,
+    'recipe-get-link': 1,
+    'short-link': 1,
+    'download-shopping-cart': 3,
+    'tag-list': 1,
+    'tag-detail': 1,
+    'ingredient-list': 1,
+    'ingredient-search': 0,
+    'ingredient-detail': 1,
+    'user-list': 4,
+    'user-detail': 2,
+    'user-me': 2,
+    'subscriptions': 5,
+    'recipe-create': 26,
+    'recipe-update': 18,
+    'recipe-delete': 15,
+    'favorite-create': 7,
+    'favorite-delete': 6,
+    'cart-create': 14,
+    'cart-delete': 11,
+    'subscribe-create': 11,
+    'subscribe-delete': 8,
+    'avatar-update': 4,
+    'avatar-delete': 5,
+    'set-password': 5,
+    'user-create': 6,
+    'token-login': 5,
+    'token-logout': 6,
+}
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@throttle_rates(user_read=None)
+class QueryBudgetTest(TestCase):
+    """Число SQL-запросов каждого маршрута API в пределах бюджета."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            user for user in seed(users=20, recipes=250)
+            if user.recipes.exists()
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        recipe_ingredient_index.invalidate()
+        self.queries = defaultdict(list)
+
+    def request(self, key, client, method, url, data=None):
+        with capture_queries() as queries:
+            response = getattr(client, method)(url, data, format='json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, f'{method} {url}')
+        self.queries[key].append(len(queries))
+        return response
+
+    def assert_budgets(self):
+        for key, counts in self.queries.items():
+            with self.subTest(key):
+                self.assertLessEqual(
+                    max(counts), QUERY_BUDGETS[key.partition('?')[0]]
+                )
+
+    def test_reads(self):
+        # Первый проход прогревает общие кэши и индексы в памяти, второй —
+        # с другим пользователем, токена и подписок которого ещё нет в кэше
+        call_reads(self.request, self.users[0])
+        self.queries.clear()
+        call_reads(self.request, self.users[1])
+        self.assert_budgets()
+
+    def test_reads_flat_across_page_sizes(self):
+        call_reads(self.request, self.users[0])
+        self.queries.clear()
+        call_reads(self.request, self.users[0])
+        pages = defaultdict(set)
+        for key, counts in self.queries.items():
+            name, _, size = key.partition('?')
+            if size:
+                pages[name].update(counts)
+        for name, counts in pages.items():
+            with self.subTest(name):
+                self.assertEqual(len(counts), 1, 'число запросов зависит '
+                                 f'от размера страницы: {counts}')
+
+    def test_writes(self):
+        call_writes(self.request, self.users[0], 0)
+        self.queries.clear()
+        call_writes(self.request, self.users[1], 1)
+        self.assert_budgets()
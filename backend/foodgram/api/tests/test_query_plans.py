@@ -0,0 +1,83 @@
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from api.audit import (capture_queries, explain, full_scans, get_client,
+                       get_routes, seed)
+from recipes.indexes import recipe_ingredient_index
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+PAGE_SIZE = 10
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class QueryPlanTest(TestCase):
+    """GET-маршруты API не читают отфильтрованные таблицы целиком."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = seed(users=20, recipes=100)[0]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        recipe_ingredient_index.invalidate()
+
+    def test_routes_use_indexes(self):
+        client = get_client(self.user)
+        for name, url in get_routes(self.user).items():
+            url = url.format(limit=PAGE_SIZE)
+            with self.subTest(name), capture_queries() as queries:
+                response = client.get(url)
+            self.assertLess(response.status_code, 400, url)
+            for sql, params in queries:
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                plan = explain(sql, params)
+                with self.subTest(name, sql=sql):
+                    self.assertFalse(
+                        full_scans(sql, plan),
+                        '\n'.join(['Полное чтение таблицы:', *plan])
+                    )
+
+
+class FullScansTest(TestCase):
+
+    sql = (
+        'SELECT "recipes_recipe"."id" FROM "recipes_recipe" '
+        'WHERE "recipes_recipe"."id" IN (SELECT U0."recipe_id" '
+        'FROM "recipes_cart" U0 WHERE U0."author_id" = %s)'
+    )
+
+    def scan(self, table, alias=None):
+        if connection.vendor == 'postgresql':
+            return [f'Seq Scan on {table} {(alias or "").lower()}'.strip()
+                    + '  (cost=0.00..1.00 rows=1 width=8)']
+        return [f'SCAN {alias or table}']
+
+    def test_aliased_subquery_table(self):
+        self.assertEqual(
+            full_scans(self.sql, self.scan('recipes_cart', 'U0')),
+            {'recipes_cart'}
+        )
+
+    def test_filtered_table(self):
+        self.assertEqual(
+            full_scans(self.sql, self.scan('recipes_recipe')),
+            {'recipes_recipe'}
+        )
+
+    def test_unfiltered_table(self):
+        self.assertEqual(
+            full_scans('SELECT "recipes_tag"."id" FROM "recipes_tag"',
+                       self.scan('recipes_tag')),
+            set()
+        )
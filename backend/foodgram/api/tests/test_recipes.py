@@ -0,0 +1,103 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (Cart, Favourite, Ingredient, IngredientForRecipe,
+                            Recipe, Tag)
+from users.models import Follow
+
+User = get_user_model()
+
+RELATION_TABLES = re.compile(
+    r'FROM "(recipes_favourite|recipes_cart|users_follow)"'
+)
+
+
+class RecipeListQueriesTest(TestCase):
+    """Число запросов списка рецептов не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(
+            username='viewer', email='viewer@example.com'
+        )
+        authors = [
+            User.objects.create_user(
+                username=f'author{i}', email=f'author{i}@example.com'
+            )
+            for i in range(3)
+        ]
+        Follow.objects.create(user=cls.viewer, author=authors[0])
+        tags = [
+            Tag.objects.create(name=f'Тег {i}', slug=f'tag{i}')
+            for i in range(2)
+        ]
+        lines = [
+            IngredientForRecipe.objects.create(
+                ingredient=Ingredient.objects.create(
+                    name=f'ингредиент {i}', measurement_unit='г'
+                ),
+                amount=i + 1
+            )
+            for i in range(3)
+        ]
+        for i in range(60):
+            recipe = Recipe.objects.create(
+                name=f'Рецепт {i}', text='Описание',
+                author=authors[i % len(authors)], cooking_time=10
+            )
+            recipe.tags.set(tags)
+            recipe.ingredients.set(lines)
+            if i % 2 == 0:
+                Favourite.objects.create(author=cls.viewer, recipe=recipe)
+                Cart.objects.create(author=cls.viewer, recipe=recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        token = Token.objects.create(user=self.viewer)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_query_count_does_not_depend_on_limit(self):
+        # Прогрев кэшей токенов и счётчиков
+        self.client.get('/api/recipes/?limit=6')
+        self.client.get('/api/recipes/?limit=50')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/recipes/?limit=6')
+        self.assertEqual(len(response.data['results']), 6)
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get('/api/recipes/?limit=50')
+        self.assertEqual(len(response.data['results']), 50)
+        self.assertTrue(any(
+            recipe['is_favorited'] and recipe['is_in_shopping_cart']
+            and recipe['author']['is_subscribed']
+            for recipe in response.data['results']
+        ))
+
+    def test_viewer_relations_limited_to_page(self):
+        self.client.get('/api/recipes/?limit=6')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/recipes/?limit=6')
+        tables = {}
+        for query in queries.captured_queries:
+            match = RELATION_TABLES.search(query['sql'])
+            if match:
+                tables[match[1]] = query['sql']
+        self.assertEqual(len(tables), 3)
+        page = {recipe['id'] for recipe in response.data['results']}
+        for sql in tables.values():
+            self.assertIn(' IN (', sql)
+            self.assertNotIn('ORDER BY', sql)
+        # Отбираются только рецепты страницы, а не всё избранное
+        in_list = re.search(
+            r'"recipe_id" IN \(([^)]*)\)', tables['recipes_favourite']
+        )[1]
+        self.assertEqual(
+            {int(pk) for pk in in_list.split(',')}, page
+        )
@@ -0,0 +1,67 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (Cart, Ingredient, IngredientForRecipe, Recipe,
+                            ShoppingListItem)
+
+User = get_user_model()
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+class ShoppingCartETagTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cooker', email='cooker@example.com'
+        )
+        cls.ingredient = Ingredient.objects.create(
+            name='свёкла', measurement_unit='г'
+        )
+        recipe = Recipe.objects.create(
+            name='Борщ', text='Борщ', author=cls.user, cooking_time=10
+        )
+        recipe.ingredients.set([IngredientForRecipe.objects.create(
+            ingredient=cls.ingredient, amount=300
+        )])
+        Cart.objects.create(author=cls.user, recipe=recipe)
+
+    def setUp(self):
+        cache.clear()
+        token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def download(self, etag=None):
+        extra = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        response = self.client.get(URL, **extra)
+        if response.status_code == 200:
+            response.text = b''.join(response.streaming_content).decode()
+        return response
+
+    def assert_not_modified(self):
+        etag = self.download()['ETag']
+        self.assertEqual(self.download(etag).status_code, 304)
+        return etag
+
+    def test_ingredient_rename_changes_etag(self):
+        etag = self.assert_not_modified()
+        self.ingredient.name = 'свекла'
+        self.ingredient.save()
+        response = self.download(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('свекла', response.text)
+
+    def test_drift_repair_changes_etag(self):
+        etag = self.assert_not_modified()
+        # Так правит расхождения rebuild_shopping_lists: без сигналов
+        ShoppingListItem.objects.filter(user=self.user).update(
+            total_amount=500
+        )
+        response = self.download(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('500', response.text)
@@ -0,0 +1,49 @@
+import hashlib
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import SimpleTestCase
+
+from api.storage import ContentHashStorage
+
+CONTENT = b'image'
+NAME = f'{hashlib.sha256(CONTENT).hexdigest()}.png'
+
+
+class ContentHashStorageTest(SimpleTestCase):
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.storage = ContentHashStorage(location=self.location)
+
+    def tearDown(self):
+        shutil.rmtree(self.location, ignore_errors=True)
+
+    def save_in_thread(self):
+        result = []
+        thread = threading.Thread(
+            target=lambda: result.append(
+                self.storage.save(NAME, ContentFile(CONTENT))
+            ),
+            daemon=True,
+        )
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive(), 'save() не завершился')
+        return result[0]
+
+    def test_saves_hashed_name_once(self):
+        self.assertEqual(self.save_in_thread(), NAME)
+        self.assertEqual(self.save_in_thread(), NAME)
+        with self.storage.open(NAME) as file:
+            self.assertEqual(file.read(), CONTENT)
+
+    def test_file_created_after_exists_check(self):
+        self.storage.save(NAME, ContentFile(CONTENT))
+        # Файл появился между exists() и записью: параллельная загрузка
+        with mock.patch.object(self.storage, 'exists', return_value=False):
+            self.assertEqual(self.save_in_thread(), NAME)
+        self.assertEqual(self.storage.listdir('')[1], [NAME])
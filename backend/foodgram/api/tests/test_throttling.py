@@ -0,0 +1,64 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.throttling import AnonReadThrottle, UserReadThrottle
+
+User = get_user_model()
+
+
+@mock.patch.object(AnonReadThrottle, 'rate', '2/min', create=True)
+class AnonReadThrottleTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get(self, forwarded_for):
+        # nginx дописывает адрес клиента в конец X-Forwarded-For
+        return self.client.get(
+            '/api/tags/', HTTP_X_FORWARDED_FOR=forwarded_for,
+            REMOTE_ADDR='172.18.0.5'
+        )
+
+    def test_clients_behind_proxy_get_own_buckets(self):
+        for _ in range(2):
+            self.assertEqual(self.get('10.0.0.1').status_code, 200)
+        self.assertEqual(self.get('10.0.0.1').status_code, 429)
+        self.assertEqual(self.get('10.0.0.2').status_code, 200)
+
+    def test_spoofed_address_does_not_reset_bucket(self):
+        for i in range(2):
+            self.get(f'192.168.0.{i}, 10.0.0.1')
+        response = self.get('192.168.0.99, 10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+
+@mock.patch.object(UserReadThrottle, 'rate', '20/min', create=True)
+class UserReadThrottleTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(
+            username='reader', email='reader@example.com'
+        )
+        token = Token.objects.create(user=user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_large_pages_cost_more(self):
+        # ?limit=100 стоит 17 обычных страниц по 6 рецептов
+        self.assertEqual(
+            self.client.get('/api/recipes/?limit=100').status_code, 200
+        )
+        response = self.client.get('/api/recipes/?limit=100')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        for _ in range(3):
+            self.assertEqual(self.client.get('/api/recipes/').status_code, 200)
+        self.assertEqual(self.client.get('/api/recipes/').status_code, 429)
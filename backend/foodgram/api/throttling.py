@@ -0,0 +1,137 @@
+"""Ограничение частоты запросов по алгоритму «ведро токенов».
+
+Скорость из DEFAULT_THROTTLE_RATES ('60/min') задаёт ёмкость ведра и
+скорость его пополнения: клиент может сделать серию до 60 запросов
+подряд, после чего получает по одному запросу каждую секунду. Состояние
+ведра хранится в кэше CACHES — в памяти процесса или в общем хранилище.
+Дорогой запрос может забирать из ведра несколько токенов (get_cost).
+"""
+import math
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from foodgram.settings import MAX_PAGE_SIZE, UPLOAD_THROTTLE_MIN_SIZE
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    cache_format = 'throttle_%(scope)s_%(ident)s'
+    wait_time = None
+
+    def applies(self, request, view):
+        return True
+
+    def get_cost(self, request, view):
+        return 1
+
+    def get_cache_key(self, request, view):
+        if not self.applies(request, view):
+            return None
+        if request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        now = self.timer()
+        refill_rate = self.num_requests / self.duration
+        tokens, updated_at = self.cache.get(
+            self.key, (self.num_requests, now)
+        )
+        tokens = min(
+            self.num_requests, tokens + (now - updated_at) * refill_rate
+        )
+        cost = min(self.get_cost(request, view), self.num_requests)
+        if tokens < cost:
+            self.wait_time = (cost - tokens) / refill_rate
+            return False
+        self.cache.set(self.key, (tokens - cost, now), self.duration)
+        return True
+
+    def wait(self):
+        if self.wait_time is None:
+            return None
+        return math.ceil(self.wait_time)
+
+
+class WriteThrottle(TokenBucketThrottle):
+    """Изменяющие запросы: создание, правка и удаление."""
+
+    scope = 'write'
+
+    def applies(self, request, view):
+        return request.method not in SAFE_METHODS
+
+
+class UploadThrottle(TokenBucketThrottle):
+    """Запросы с изображением в base64: рецепт с фото и аватар.
+
+    Такие запросы узнаются по размеру тела, чтобы отклонить их,
+    не разбирая JSON.
+    """
+
+    scope = 'upload'
+
+    def applies(self, request, view):
+        if request.method in SAFE_METHODS:
+            return False
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return False
+        return length > UPLOAD_THROTTLE_MIN_SIZE
+
+
+class ExportThrottle(TokenBucketThrottle):
+    """Выгрузка списка покупок."""
+
+    scope = 'export'
+
+
+class ReadThrottle(TokenBucketThrottle):
+    """Чтение: страница из ?limit= объектов стоит как limit / PAGE_SIZE
+    обычных страниц, иначе ?limit=100 обходится в 17 раз дешевле."""
+
+    def get_cost(self, request, view):
+        try:
+            limit = int(request.query_params.get('limit') or 0)
+        except ValueError:
+            return 1
+        page_size = api_settings.PAGE_SIZE
+        return max(1, math.ceil(min(limit, MAX_PAGE_SIZE) / page_size))
+
+
+class AnonReadThrottle(ReadThrottle):
+    """Чтение анонимными клиентами, по IP-адресу.
+
+    Адрес берётся из X-Forwarded-For с учётом NUM_PROXIES: за nginx
+    REMOTE_ADDR у всех клиентов один, а адреса, которые клиент дописал
+    в заголовок сам, пропускаются.
+    """
+
+    scope = 'anon_read'
+
+    def applies(self, request, view):
+        return (
+            request.method in SAFE_METHODS
+            and not request.user.is_authenticated
+        )
+
+
+class UserReadThrottle(ReadThrottle):
+    """Чтение авторизованными пользователями, в том числе списки с ?limit=."""
+
+    scope = 'user_read'
+
+    def applies(self, request, view):
+        return (
+            request.method in SAFE_METHODS
+            and request.user.is_authenticated
+        )
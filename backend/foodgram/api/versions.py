@@ -0,0 +1,45 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from recipes.models import (Cart, Favourite, Ingredient, IngredientForRecipe,
+                            Recipe, Tag)
+from users.models import Follow
+
+KEY = 'version:{}'
+
+VERSIONED_MODELS = (
+    Recipe, Tag, Ingredient, IngredientForRecipe, Cart, Favourite, Follow,
+    get_user_model(),
+)
+
+
+def version_name(model):
+    return model._meta.label_lower
+
+
+def initial_version():
+    # Начальное значение от времени, чтобы после сброса кэша счётчики
+    # не повторяли уже выданные ETag
+    return time.time_ns()
+
+
+def bump(model):
+    """Увеличивает счётчик версии данных модели."""
+    key = KEY.format(version_name(model))
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, initial_version(), timeout=None)
+
+
+def get_versions(models):
+    """Текущие версии моделей одним обращением к кэшу."""
+    keys = [KEY.format(version_name(model)) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, initial_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
@@ -1,21 +1,32 @@
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db.models import Count, OuterRef, Prefetch, Subquery
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as BaseUserViewSet
 from rest_framework import status, views, viewsets
 from rest_framework.authtoken.models import Token
-from rest_framework.decorators import api_view
-from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.decorators import (action, api_view, permission_classes,
+                                       renderer_classes, throttle_classes)
 from rest_framework.permissions import AllowAny, IsAuthenticated, SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
-from recipes.models import Cart, Favourite, Ingredient, Recipe, Tag
-from .pagination import RecipePagination
+from foodgram.settings import TOP_RECIPES_LIMIT, TOP_RECIPES_MAX
+from recipes.feed import feed_filter
+from recipes.indexes import ingredient_index
+from recipes.models import (Cart, Favourite, Ingredient, IngredientForRecipe,
+                            Recipe, Tag)
+from recipes.popularity import COUNTERS
+from .pagination import (CachedCountLimitOffsetPagination,
+                         RecipeCursorPagination, RecipePagination)
 from users.models import Follow
+from .authentication import is_expired
 from .filters import RecipeFilter
+from .mixins import ConditionalGetMixin
 from .permissions import IsAuthorOrReadOnly, IsCurrentUserOrReadOnly
+from .renderers import CSVRenderer, PlainTextRenderer
 from .serializers import (AvatarUserSerializer, CartSerializer,
                           FavouriteSerializer, FollowSerializer,
                           FollowUserSerializer, IngredientNotAmountSerializer,
@@ -23,6 +34,8 @@ from .serializers import (AvatarUserSerializer, CartSerializer,
                           TagSerializer, TokenSerializer,
                           UserReadFollowSerializer, UserSerializer,
                           RecipeReadSerializer, RecipeCreateUpdateSerializer)
+from .shopping_cart import export_shopping_cart, shopping_cart_etag
+from .throttling import ExportThrottle
 
 
 User = get_user_model()
@@ -30,15 +43,38 @@ User = get_user_model()
 
 class FollowViewSet(viewsets.ModelViewSet):
     serializer_class = FollowSerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = CachedCountLimitOffsetPagination
 
     def get_queryset(self):
         return self.request.user.followers.all()
 
+    def get_recipes_limit(self):
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        try:
+            recipes_limit = int(recipes_limit)
+        except (TypeError, ValueError):
+            return None
+        return recipes_limit if recipes_limit > 0 else None
+
+    def get_authors_queryset(self, recipes_limit):
+        recipes = Recipe.objects.all()
+        if recipes_limit is not None:
+            recipes = recipes.filter(id__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('id')[:recipes_limit]
+            ))
+        return User.objects.filter(
+            respondents__user=self.request.user
+        ).annotate(
+            recipes_count=Count('recipes', distinct=True),
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+        )
+
     def list(self, request, *args, **kwargs):
-        user = request.user
-        recipes_limit = self.request.query_params.get('recipes_limit', None)
-        queryset = User.objects.filter(respondents__user=user)
+        recipes_limit = self.get_recipes_limit()
+        queryset = self.get_authors_queryset(recipes_limit)
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = UserReadFollowSerializer(
@@ -66,9 +102,10 @@ class AvatarUserViewSet(viewsets.ModelViewSet):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class UserViewSet(BaseUserViewSet):
+class UserViewSet(ConditionalGetMixin, BaseUserViewSet):
     serializer_class = UserSerializer
-    pagination_class = LimitOffsetPagination
+    pagination_class = CachedCountLimitOffsetPagination
+    etag_models = (User, Follow)
 
     def get_permissions(self):
         if self.action == 'me':
@@ -81,32 +118,99 @@ class UserViewSet(BaseUserViewSet):
         return super().get_permissions()
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = [IsAuthorOrReadOnly]
     pagination_class = RecipePagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    etag_models = (
+        Recipe, Tag, Ingredient, IngredientForRecipe, Cart, Favourite,
+        Follow, User,
+    )
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        return queryset.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredients',
+                queryset=IngredientForRecipe.objects.select_related(
+                    'ingredient'
+                )
+            ),
+        )
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @action(
+        detail=False,
+        permission_classes=[IsAuthenticated],
+        pagination_class=RecipeCursorPagination,
+    )
+    def feed(self, request):
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            feed_filter(request.user)
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def get_top_limit(self):
+        try:
+            limit = int(self.request.query_params.get('limit'))
+        except (TypeError, ValueError):
+            return TOP_RECIPES_LIMIT
+        return min(max(limit, 1), TOP_RECIPES_MAX)
+
+    def top_recipes(self, request):
+        fields = {
+            related_name: field for field, related_name in COUNTERS.values()
+        }
+        field = fields.get(request.query_params.get('by'), 'favorites_count')
+        queryset = self.get_queryset().order_by(f'-{field}', '-id')
+        serializer = self.get_serializer(
+            queryset[:self.get_top_limit()], many=True
+        )
+        return Response(serializer.data)
+
+    @action(detail=False)
+    def top(self, request):
+        return self.conditional_get(self.top_recipes, request)
+
     def get_serializer_class(self):
         if self.request.method in SAFE_METHODS:
             return RecipeReadSerializer
         return RecipeCreateUpdateSerializer
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
+    etag_models = (Tag,)
+    etag_per_user = False
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin,
+                        viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientNotAmountSerializer
     pagination_class = None
+    etag_models = (Ingredient,)
+    etag_per_user = False
+
+    def search(self, request, name):
+        return Response(ingredient_index.search(name))
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        return self.conditional_get(self.search, request, name)
 
 
 class FavouriteViewSet(viewsets.ModelViewSet):
@@ -201,6 +305,9 @@ def get_token(request):
         return Response({'detail': f'Пользователь {email} не существует.'},
                         status=status.HTTP_404_NOT_FOUND)
     token, created = Token.objects.get_or_create(user=user)
+    if is_expired(token):
+        token.delete()
+        token = Token.objects.create(user=user)
     return Response({'auth_token': token.key}, status=status.HTTP_200_OK)
 
 
@@ -213,27 +320,20 @@ def delete_token(request):
 
 
 @api_view(['GET'])
+@renderer_classes([PlainTextRenderer, CSVRenderer, JSONRenderer])
+@permission_classes([IsAuthenticated])
+@throttle_classes([ExportThrottle])
+@condition(etag_func=shopping_cart_etag)
 def download_shopping_cart(request):
     user = request.user
     if not user.carts.exists():
         return Response(status=status.HTTP_400_BAD_REQUEST)
-    ingredients = user.carts.all().values(
-        'recipe__ingredients__ingredient__measurement_unit',
-        'recipe__ingredients__ingredient__name'
-    ).annotate(
-        amount=Sum('recipe__ingredients__amount')
-    ).order_by('recipe__ingredients__ingredient__measurement_unit')
-    shopping_cart_list = []
-    shopping_cart_list += '\n'.join([
-        f'- {ingredient["recipe__ingredients__ingredient__name"]} '
-        f'— {ingredient["amount"]} '
-        f'{ingredient["recipe__ingredients__ingredient__measurement_unit"]}'
-        for ingredient in ingredients
-    ])
-    response = HttpResponse(
-        shopping_cart_list, content_type='text.txt; charset=utf-8'
+    renderer = request.accepted_renderer
+    response = StreamingHttpResponse(
+        export_shopping_cart(user, renderer.format),
+        content_type=f'{renderer.media_type}; charset=utf-8'
     )
-    filename = 'shopping_cart_list.txt'
+    filename = f'shopping_cart_list.{renderer.format}'
     response['Content-Disposition'] = f'attachment; filename={filename}'
     return response
 
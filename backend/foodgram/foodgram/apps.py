@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class FoodgramConfig(AppConfig):
+    """Настройки проекта, не относящиеся к отдельному приложению."""
+
+    name = 'foodgram'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,126 @@
+"""Чтение с реплик, запись в основную базу.
+
+Реплики — все алиасы DATABASES, кроме default. Маршрутизация включается
+только внутри запроса с безопасным методом (GET, HEAD, OPTIONS):
+остальные запросы, команды и фоновые задачи работают с default.
+После записи клиент ещё REPLICA_STICKY_SECONDS читает из default
+(по cookie), а внутри запроса — до его конца, чтобы видеть свои
+изменения, пока реплика догоняет основную базу.
+"""
+import contextvars
+import random
+import threading
+import time
+
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from foodgram.settings import (REPLICA_HEALTH_CHECK_INTERVAL,
+                               REPLICA_STICKY_COOKIE, REPLICA_STICKY_SECONDS)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+use_replicas = contextvars.ContextVar('use_replicas', default=False)
+
+
+def get_replicas():
+    return [alias for alias in connections if alias != DEFAULT_DB_ALIAS]
+
+
+class ReplicaHealth:
+    """Доступность реплик, проверяется не чаще раза в interval секунд.
+
+    Проверка идёт в фоновом потоке: запрос не ждёт соединения с
+    недоступной репликой и пользуется последним известным состоянием.
+    """
+
+    def __init__(self, interval=REPLICA_HEALTH_CHECK_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._checked = {}
+
+    def check(self, alias):
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except DatabaseError:
+            return False
+        finally:
+            # Соединения привязаны к потоку: закрываем своё
+            connections[alias].close()
+        return True
+
+    def refresh(self, alias):
+        healthy = self.check(alias)
+        with self._lock:
+            self._checked[alias] = (healthy, time.monotonic())
+        return healthy
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            healthy, checked_at = self._checked.get(alias, (True, None))
+            if checked_at is not None and now - checked_at < self.interval:
+                return healthy
+            # Следующая проверка не раньше чем через interval, даже если
+            # эта ещё не завершилась
+            self._checked[alias] = (healthy, now)
+        threading.Thread(
+            target=self.refresh, args=(alias,), daemon=True
+        ).start()
+        return healthy
+
+
+replica_health = ReplicaHealth()
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if not use_replicas.get():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        replicas = [
+            alias for alias in get_replicas()
+            if replica_health.is_healthy(alias)
+        ]
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Дальше в этом запросе читаем свои изменения из основной базы
+        use_replicas.set(False)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """Включает чтение с реплик для безопасных запросов."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        enabled = (
+            request.method in SAFE_METHODS
+            and REPLICA_STICKY_COOKIE not in request.COOKIES
+            and bool(get_replicas())
+        )
+        token = use_replicas.set(enabled)
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replicas.reset(token)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                REPLICA_STICKY_COOKIE, '1',
+                max_age=REPLICA_STICKY_SECONDS, httponly=True,
+                samesite='Lax'
+            )
+        return response
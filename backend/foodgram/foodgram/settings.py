@@ -32,6 +32,7 @@ INSTALLED_APPS = [
     'djoser',
     'rest_framework',
     'rest_framework.authtoken',
+    'foodgram.apps.FoodgramConfig',
     'api.apps.ApiConfig',
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
@@ -40,6 +41,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'foodgram.db_routers.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -72,12 +74,63 @@ WSGI_APPLICATION = 'foodgram.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# PostgreSQL включается переменной POSTGRES_DB, иначе используется SQLite;
+# SQLITE_TUNED включает WAL и остальные PRAGMA из foodgram.sqlite_backend.
+# CONN_MAX_AGE — время жизни постоянного соединения в секундах
+USE_POSTGRES = bool(os.getenv('POSTGRES_DB'))
+
+if USE_POSTGRES:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB'),
+            'USER': os.getenv('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', ''),
+            'PORT': os.getenv('DB_PORT', 5432),
+            'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', 60)),
+            'DISABLE_SERVER_SIDE_CURSORS': strtobool(
+                os.getenv('DISABLE_SERVER_SIDE_CURSORS', 'False')
+            ),
+        }
     }
-}
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': (
+                'foodgram.sqlite_backend'
+                if strtobool(os.getenv('SQLITE_TUNED', 'True'))
+                else 'django.db.backends.sqlite3'
+            ),
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
+# Реплики для чтения: DB_REPLICAS — через запятую адреса серверов
+# PostgreSQL (для SQLite — пути к файлам), остальные параметры берутся
+# у default. Соединение с недоступной репликой обрывается через
+# REPLICA_CONNECT_TIMEOUT секунд
+REPLICA_CONNECT_TIMEOUT = int(os.getenv('REPLICA_CONNECT_TIMEOUT', 2))
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), start=1
+):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'HOST' if USE_POSTGRES else 'NAME': replica.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    if USE_POSTGRES:
+        DATABASES[f'replica{number}']['OPTIONS'] = {
+            'connect_timeout': REPLICA_CONNECT_TIMEOUT
+        }
+
+DATABASE_ROUTERS = ['foodgram.db_routers.ReplicaRouter']
+
+# Реплика, не ответившая на фоновую проверку, исключается на столько секунд;
+# после записи клиент столько секунд читает из основной базы
+REPLICA_HEALTH_CHECK_INTERVAL = 30
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 5))
+REPLICA_STICKY_COOKIE = 'use_primary'
 
 
 # Password validation
@@ -104,7 +157,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
 
     'DEFAULT_FILTER_BACKENDS': [
@@ -117,6 +170,23 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 6,
     'SEARCH_PARAM': 'name',
 
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.AnonReadThrottle',
+        'api.throttling.UserReadThrottle',
+        'api.throttling.WriteThrottle',
+        'api.throttling.UploadThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'anon_read': os.getenv('THROTTLE_ANON_READ', '120/min'),
+        'user_read': os.getenv('THROTTLE_USER_READ', '240/min'),
+        'write': os.getenv('THROTTLE_WRITE', '60/min'),
+        'upload': os.getenv('THROTTLE_UPLOAD', '20/hour'),
+        'export': os.getenv('THROTTLE_EXPORT', '10/min'),
+    },
+    # Число прокси перед приложением (nginx), дописывающих адрес клиента
+    # в X-Forwarded-For; 0 — запросы приходят напрямую
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 1)),
+
 }
 
 DJOSER = {
@@ -179,3 +249,84 @@ MAX_COOKING_TIME = 32000
 # Ограничения по количеству ингредиентов
 MIN_AMOUNT = 1
 MAX_AMOUNT = 32000
+
+# Максимальное число подсказок при поиске ингредиентов по названию
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', 50))
+
+# Каталог с файлами для импорта ингредиентов
+DATA_DIR = Path(os.getenv('DATA_DIR', BASE_DIR / 'data'))
+
+# Короткие ссылки на рецепты: множитель для перемешивания id
+# (должен быть взаимно прост с 62 ** 7), размер LRU-кэша и время
+# кэширования редиректа в секундах
+SHORT_LINK_MULTIPLIER = int(os.getenv('SHORT_LINK_MULTIPLIER', 2176477521739))
+SHORT_LINK_CACHE_SIZE = 4096
+SHORT_LINK_MAX_AGE = 60 * 60 * 24
+
+# Хранилище файлов: изображения с именем-хешем содержимого хранятся один раз
+DEFAULT_FILE_STORAGE = 'api.storage.ContentHashStorage'
+
+# Загрузка изображений: допустимые форматы, предельные размеры и
+# уменьшенные копии (имя: максимальные ширина и высота)
+IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+IMAGE_MAX_SIDE = 8000
+IMAGE_RENDITIONS = {
+    'thumbnail': (480, 480),
+    'detail': (1200, 1200),
+    'avatar': (256, 256),
+}
+
+# Кэш: в нём счётчики версий для ETag, лимиты запросов и кэш токенов,
+# поэтому в продакшене он должен быть общим для всех воркеров (в
+# docker-compose — memcached). Кэш в памяти процесса — только для
+# разработки и тестов: manage.py check --deploy предупреждает о нём
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Число объектов в пагинации: время кэширования точного COUNT(*) в секундах
+# и порог, начиная с которого используется оценка планировщика PostgreSQL
+PAGINATION_COUNT_CACHE_TTL = int(os.getenv('PAGINATION_COUNT_CACHE_TTL', 60))
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = int(
+    os.getenv('PAGINATION_COUNT_ESTIMATE_THRESHOLD', 100000)
+)
+
+# Лента подписок: рецепты авторов, у которых подписчиков больше
+# FEED_FANOUT_LIMIT, не раскладываются по лентам, а подмешиваются при
+# чтении; при подписке в ленту добавляются FEED_BACKFILL_SIZE последних
+# рецептов автора
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', 1000))
+FEED_BACKFILL_SIZE = 20
+
+# Фильтры по ингредиентам (has_ingredients, can_cook_with): максимальное
+# число результатов после применения остальных фильтров
+SEARCH_MAX_RESULTS = 1000
+
+# Эндпоинт /api/recipes/top/: число рецептов по умолчанию и максимум
+TOP_RECIPES_LIMIT = 10
+TOP_RECIPES_MAX = 100
+
+# Токены авторизации: время жизни в секундах (0 — бессрочно), время жизни
+# записи в кэше процесса, размер этого кэша и использование общего кэша
+# CACHES вторым уровнем
+TOKEN_TTL = int(os.getenv('TOKEN_TTL', 60 * 60 * 24 * 30))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 60))
+TOKEN_CACHE_SIZE = 10000
+TOKEN_CACHE_SHARED = strtobool(os.getenv('TOKEN_CACHE_SHARED', 'False'))
+
+# Максимальный размер страницы в пагинации (?limit=)
+MAX_PAGE_SIZE = 100
+
+# Запросы с телом больше этого размера (в байтах) считаются загрузкой
+# изображения и ограничиваются по частоте отдельно
+UPLOAD_THROTTLE_MIN_SIZE = 64 * 1024
+
+# Размер пачки строк при чтении больших выборок через .iterator():
+# на PostgreSQL это серверный курсор
+ITERATOR_CHUNK_SIZE = 2000
@@ -0,0 +1,12 @@
+from django.core.signals import request_started
+from django.db import connections
+from django.dispatch import receiver
+
+
+@receiver(request_started)
+def close_broken_connections(sender, **kwargs):
+    # Постоянное соединение (CONN_MAX_AGE) могло оборваться, пока воркер
+    # простаивал, например при перезапуске PostgreSQL
+    for connection in connections.all():
+        if connection.connection is not None and not connection.is_usable():
+            connection.close()
@@ -0,0 +1,31 @@
+"""SQLite для работы под gunicorn с несколькими воркерами.
+
+На каждом соединении выставляются PRAGMA из DATABASES[...]['PRAGMAS']:
+WAL позволяет читать во время записи, busy_timeout — ждать блокировку
+вместо ошибки «database is locked». Транзакции atomic() начинаются
+с BEGIN IMMEDIATE: блокировка записи берётся сразу, и две транзакции
+не упираются друг в друга при попытке перейти от чтения к записи.
+"""
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        pragmas = {**PRAGMAS, **self.settings_dict.get('PRAGMAS', {})}
+        for name, value in pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase
+
+from api.pagination import cached_count
+from foodgram.db_routers import (ReplicaHealth, ReplicaRoutingMiddleware,
+                                 use_replicas)
+from foodgram.settings import REPLICA_STICKY_COOKIE
+from recipes.indexes import ingredient_index
+from recipes.models import Ingredient, Tag
+
+REPLICA = 'replica_test'
+
+
+def tag_names():
+    return set(Tag.objects.values_list('name', flat=True))
+
+
+class ReplicaRouterTest(TransactionTestCase):
+    """Реплика — отдельный файл SQLite с другими данными, чем default."""
+
+    def setUp(self):
+        # Алиас добавляется после setUpClass: иначе тестовый раннер
+        # попытался бы создать для него тестовую базу
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.missing = os.path.join(directory, 'missing', 'replica.sqlite3')
+        connections.databases[REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(directory, 'replica.sqlite3'),
+        }
+        self.addCleanup(self.remove_replica)
+        with connections[REPLICA].schema_editor() as editor:
+            editor.create_model(Tag)
+        Tag.objects.create(name='primary', slug='primary')
+        Tag.objects.using(REPLICA).create(name='replica', slug='replica')
+        self.health = ReplicaHealth(interval=60)
+        self.health.refresh(REPLICA)
+        patcher = mock.patch('foodgram.db_routers.replica_health', self.health)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+
+    def remove_replica(self):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.databases[REPLICA]
+
+    def request(self, method, view, cookies=None):
+        request = getattr(self.factory, method)('/')
+        request.COOKIES.update(cookies or {})
+        return ReplicaRoutingMiddleware(view)(request)
+
+    def test_reads_own_writes_after_write(self):
+        def view(request):
+            self.names = [tag_names()]
+            Tag.objects.create(name='new', slug='new')
+            self.names.append(tag_names())
+            return HttpResponse()
+
+        self.request('get', view)
+        self.assertEqual(self.names, [{'replica'}, {'primary', 'new'}])
+
+    def test_sticky_cookie_after_write(self):
+        def view(request):
+            self.names = tag_names()
+            return HttpResponse(status=201)
+
+        response = self.request('post', view)
+        self.assertIn(REPLICA_STICKY_COOKIE, response.cookies)
+        self.request('get', view, {REPLICA_STICKY_COOKIE: '1'})
+        self.assertEqual(self.names, {'primary'})
+        self.request('get', view)
+        self.assertEqual(self.names, {'replica'})
+
+    def test_failed_write_sets_no_cookie(self):
+        response = self.request(
+            'post', lambda request: HttpResponse(status=400)
+        )
+        self.assertNotIn(REPLICA_STICKY_COOKIE, response.cookies)
+
+    def test_cache_fills_read_primary(self):
+        cache.clear()
+        ingredient_index.invalidate()
+        self.addCleanup(ingredient_index.invalidate)
+        Ingredient.objects.create(name='мука', measurement_unit='г')
+        Tag.objects.using(REPLICA).create(name='stale', slug='stale')
+        token = use_replicas.set(True)
+        try:
+            self.assertEqual(tag_names(), {'replica', 'stale'})
+            self.assertEqual(cached_count(Tag.objects.all()), 1)
+            # Таблицы ингредиентов на реплике нет: индекс читает default
+            self.assertEqual(len(ingredient_index.search('мук')), 1)
+        finally:
+            use_replicas.reset(token)
+
+    def test_failover_to_primary(self):
+        settings_dict = connections[REPLICA].settings_dict
+        name = settings_dict['NAME']
+        settings_dict['NAME'] = self.missing
+        connections[REPLICA].close()
+        try:
+            self.assertFalse(self.health.refresh(REPLICA))
+            token = use_replicas.set(True)
+            try:
+                self.assertEqual(tag_names(), {'primary'})
+            finally:
+                use_replicas.reset(token)
+        finally:
+            settings_dict['NAME'] = name
+
+    def test_health_check_does_not_block_request(self):
+        release = threading.Event()
+
+        def check(alias):
+            release.wait(5)
+            return False
+
+        health = ReplicaHealth(interval=60)
+        with mock.patch.object(health, 'check', check):
+            # Первая проверка ещё идёт: запрос не ждёт её
+            self.assertTrue(health.is_healthy(REPLICA))
+            release.set()
+            deadline = time.monotonic() + 5
+            while health.is_healthy(REPLICA) and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertFalse(health.is_healthy(REPLICA))
@@ -0,0 +1,49 @@
+import threading
+from unittest import mock, skipIf
+
+from django.core.signals import request_started
+from django.db import connection, connections
+from django.test import SimpleTestCase, TransactionTestCase
+
+from recipes.models import Tag
+
+
+class CloseBrokenConnectionsTest(SimpleTestCase):
+
+    def test_closes_only_broken_connections(self):
+        broken, alive = mock.Mock(), mock.Mock()
+        broken.is_usable.return_value = False
+        alive.is_usable.return_value = True
+        idle = mock.Mock(connection=None)
+        with mock.patch('foodgram.signals.connections') as handler:
+            handler.all.return_value = [broken, alive, idle]
+            request_started.send(sender=None)
+        broken.close.assert_called_once()
+        alive.close.assert_not_called()
+        idle.is_usable.assert_not_called()
+
+
+@skipIf(connection.vendor != 'postgresql', 'Только для PostgreSQL')
+class DroppedConnectionTest(TransactionTestCase):
+
+    def terminate(self, pid):
+        # Соединения привязаны к потоку: обрываем чужим соединением, как
+        # при перезапуске сервера
+        def run():
+            with connections['default'].cursor() as cursor:
+                cursor.execute('SELECT pg_terminate_backend(%s)', [pid])
+            connections['default'].close()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join(5)
+
+    def test_request_recovers_dropped_connection(self):
+        Tag.objects.create(name='Завтрак', slug='breakfast')
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_backend_pid()')
+            pid = cursor.fetchone()[0]
+        self.terminate(pid)
+        response = self.client.get('/api/tags/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
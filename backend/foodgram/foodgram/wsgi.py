@@ -14,3 +14,14 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
 application = get_wsgi_application()
+
+from django.db import DatabaseError  # noqa: E402
+
+from recipes.indexes import (ingredient_index,  # noqa: E402
+                             recipe_ingredient_index)
+
+try:
+    ingredient_index.build()
+    recipe_ingredient_index.build()
+except DatabaseError:
+    pass
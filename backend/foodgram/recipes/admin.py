@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 from .models import (Cart, Favourite, Ingredient, IngredientForRecipe, Recipe,
-                     Tag)
+                     ShoppingListItem, Tag)
 
 
 class RecipeAdmin(admin.ModelAdmin):
@@ -46,9 +46,14 @@ class FavouritesAdmin(admin.ModelAdmin):
     list_display = ('author', 'recipe')
 
 
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ingredient', 'total_amount')
+
+
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(IngredientForRecipe, IngredientForRecipeAdmin)
 admin.site.register(Cart, CartAdmin)
 admin.site.register(Favourite, FavouritesAdmin)
+admin.site.register(ShoppingListItem, ShoppingListItemAdmin)
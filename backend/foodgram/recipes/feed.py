@@ -0,0 +1,78 @@
+from django.db.models import Q
+
+from foodgram.settings import (FEED_BACKFILL_SIZE, FEED_FANOUT_LIMIT,
+                               ITERATOR_CHUNK_SIZE)
+from users.models import CustomUser, Follow
+from .models import FeedEntry, Recipe
+
+
+def is_fanned_out(author_id):
+    """Раскладываются ли рецепты автора по лентам подписчиков при записи.
+
+    Превысив FEED_FANOUT_LIMIT, автор навсегда переходит в режим чтения:
+    флаг feed_merged не снимается, иначе его рецепты, не разложенные по
+    лентам, пропали бы из них при отписках.
+    """
+    author = CustomUser.objects.filter(pk=author_id)
+    if author.filter(feed_merged=True).exists():
+        return False
+    if Follow.objects.filter(author=author_id).count() <= FEED_FANOUT_LIMIT:
+        return True
+    author.update(feed_merged=True)
+    return False
+
+
+def fan_out_recipe(recipe):
+    if not is_fanned_out(recipe.author_id):
+        return
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, recipe_id=recipe.pk)
+            for user_id in Follow.objects.filter(
+                author=recipe.author_id
+            ).values_list('user_id', flat=True).iterator(
+                chunk_size=ITERATOR_CHUNK_SIZE
+            )
+        ),
+        ignore_conflicts=True
+    )
+
+
+def backfill_feed(follow):
+    if not is_fanned_out(follow.author_id):
+        return
+    recipe_ids = Recipe.objects.filter(
+        author=follow.author_id
+    ).values_list('id', flat=True)[:FEED_BACKFILL_SIZE]
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=follow.user_id, recipe_id=recipe_id)
+            for recipe_id in recipe_ids
+        ),
+        ignore_conflicts=True
+    )
+
+
+def clear_feed(follow):
+    FeedEntry.objects.filter(
+        user=follow.user_id, recipe__author=follow.author_id
+    ).delete()
+
+
+def feed_filter(user):
+    """Условие для Recipe: лента пользователя.
+
+    Рецепты из FeedEntry читаются по индексу (user, recipe); рецепты
+    авторов с флагом feed_merged добавляются при чтении.
+    """
+    merged_authors = list(
+        Follow.objects.filter(
+            user=user, author__feed_merged=True
+        ).order_by().values_list('author_id', flat=True)
+    )
+    if not merged_authors:
+        return Q(feed_entries__user=user)
+    return (
+        Q(id__in=FeedEntry.objects.filter(user=user).values('recipe_id'))
+        | Q(author_id__in=merged_authors)
+    )
@@ -0,0 +1,235 @@
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from foodgram.settings import INGREDIENT_SEARCH_LIMIT
+
+
+def bump_version(key):
+    """Увеличивает версию индекса в общем кэше; None, если её не было."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        return None
+
+
+def normalize(value):
+    """Приводит строку к виду для регистронезависимого поиска."""
+    return value.casefold().replace('ё', 'е').strip()
+
+
+class IngredientNameIndex:
+    """Индекс названий ингредиентов в памяти процесса.
+
+    Хранит отсортированный список нормализованных названий: совпадения
+    по префиксу ищутся бинарным поиском, по подстроке — перебором.
+    Строится при первом обращении и сбрасывается сигналами модели;
+    версия в общем кэше сообщает другим процессам, что их копия устарела.
+    """
+
+    VERSION_KEY = 'ingredient_name_index:version'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = None
+        self._rows = None
+        self._version = None
+
+    def invalidate(self):
+        with self._lock:
+            self._keys = None
+            self._rows = None
+        bump_version(self.VERSION_KEY)
+
+    def build(self):
+        from .models import Ingredient
+
+        version = cache.get(self.VERSION_KEY)
+        # Индекс живёт до смены версии: отстающая реплика закрепила бы в
+        # нём старые данные
+        rows = sorted(
+            (normalize(name), pk, name, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.using(
+                DEFAULT_DB_ALIAS
+            ).values_list('id', 'name', 'measurement_unit')
+        )
+        with self._lock:
+            self._keys = [row[0] for row in rows]
+            self._rows = rows
+            self._version = version
+        return self._keys, self._rows
+
+    def _get(self):
+        keys, rows = self._keys, self._rows
+        if keys is None or self._version != cache.get(self.VERSION_KEY):
+            keys, rows = self.build()
+        return keys, rows
+
+    def search(self, query, limit=INGREDIENT_SEARCH_LIMIT):
+        query = normalize(query)
+        keys, rows = self._get()
+        start = bisect_left(keys, query)
+        end = start
+        while end < len(keys) and keys[end].startswith(query):
+            end += 1
+        found = rows[start:end]
+        if limit is None or len(found) < limit:
+            found += [
+                row for row in rows[:start] + rows[end:]
+                if query in row[0]
+            ]
+        if limit is not None:
+            found = found[:limit]
+        return [
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for _, pk, name, measurement_unit in found
+        ]
+
+
+def contains(ids, value):
+    """Проверяет наличие value в отсортированном массиве ids."""
+    position = bisect_left(ids, value)
+    return position < len(ids) and ids[position] == value
+
+
+def discard(ids, value):
+    position = bisect_left(ids, value)
+    if position < len(ids) and ids[position] == value:
+        del ids[position]
+
+
+class RecipeIngredientIndex:
+    """Обратный индекс «ингредиент → рецепты» в памяти процесса.
+
+    Для каждого ингредиента хранит отсортированный массив id рецептов,
+    для каждого рецепта — множество его ингредиентов. Строится одним
+    запросом к промежуточной таблице и обновляется по одному рецепту
+    сигналами. Версия в общем кэше сообщает другим процессам, что их
+    копия индекса устарела.
+    """
+
+    VERSION_KEY = 'recipe_ingredient_index:version'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = None
+        self._recipes = None
+        self._version = None
+
+    def invalidate(self):
+        with self._lock:
+            self._postings = None
+            self._recipes = None
+        bump_version(self.VERSION_KEY)
+
+    def build(self):
+        from .models import Recipe
+
+        version = cache.get(self.VERSION_KEY)
+        recipes = defaultdict(set)
+        for recipe_id, ingredient_id in (
+            Recipe.ingredients.through.objects.using(
+                DEFAULT_DB_ALIAS
+            ).values_list('recipe_id', 'ingredientforrecipe__ingredient_id')
+        ):
+            recipes[recipe_id].add(ingredient_id)
+        postings = defaultdict(list)
+        for recipe_id in sorted(recipes):
+            for ingredient_id in recipes[recipe_id]:
+                postings[ingredient_id].append(recipe_id)
+        postings = {
+            ingredient_id: array('q', recipe_ids)
+            for ingredient_id, recipe_ids in postings.items()
+        }
+        with self._lock:
+            self._postings = postings
+            self._recipes = dict(recipes)
+            self._version = version
+        return postings, self._recipes
+
+    def _get(self):
+        postings, recipes = self._postings, self._recipes
+        if postings is None or self._version != cache.get(self.VERSION_KEY):
+            postings, recipes = self.build()
+        return postings, recipes
+
+    def refresh(self, recipe_id):
+        """Перечитывает ингредиенты одного рецепта."""
+        from .models import Recipe
+
+        self._update(recipe_id, set(
+            Recipe.ingredients.through.objects.using(DEFAULT_DB_ALIAS).filter(
+                recipe_id=recipe_id
+            ).values_list('ingredientforrecipe__ingredient_id', flat=True)
+        ))
+
+    def remove(self, recipe_id):
+        self._update(recipe_id, set())
+
+    def _update(self, recipe_id, ingredient_ids):
+        version = bump_version(self.VERSION_KEY)
+        with self._lock:
+            if self._postings is None:
+                return
+            if version is None or self._version != version - 1:
+                # Индекс успели изменить в другом процессе: дешевле
+                # перестроить его при следующем чтении
+                self._postings = None
+                self._recipes = None
+                return
+            old_ids = self._recipes.pop(recipe_id, set())
+            for ingredient_id in old_ids - ingredient_ids:
+                discard(self._postings[ingredient_id], recipe_id)
+            for ingredient_id in ingredient_ids - old_ids:
+                insort(
+                    self._postings.setdefault(ingredient_id, array('q')),
+                    recipe_id
+                )
+            if ingredient_ids:
+                self._recipes[recipe_id] = ingredient_ids
+            self._version = version
+
+    def has_all(self, ingredient_ids):
+        """Рецепты, в которых есть все ингредиенты из ingredient_ids.
+
+        Выше те, в которых заданные ингредиенты составляют большую долю.
+        """
+        postings, recipes = self._get()
+        ingredient_ids = set(ingredient_ids)
+        lists = sorted(
+            (postings.get(pk, ()) for pk in ingredient_ids), key=len
+        )
+        if not lists:
+            return []
+        found = lists[0]
+        for recipe_ids in lists[1:]:
+            found = [pk for pk in found if contains(recipe_ids, pk)]
+        return sorted(
+            found,
+            key=lambda pk: (len(ingredient_ids) / len(recipes[pk]), pk),
+            reverse=True
+        )
+
+    def can_cook_with(self, ingredient_ids):
+        """Рецепты, все ингредиенты которых есть в ingredient_ids.
+
+        Выше те, что используют больше имеющихся ингредиентов.
+        """
+        postings, recipes = self._get()
+        hits = Counter()
+        for pk in set(ingredient_ids):
+            hits.update(postings.get(pk, ()))
+        return sorted(
+            (pk for pk, count in hits.items() if count == len(recipes[pk])),
+            key=lambda pk: (hits[pk], pk),
+            reverse=True
+        )
+
+
+ingredient_index = IngredientNameIndex()
+recipe_ingredient_index = RecipeIngredientIndex()
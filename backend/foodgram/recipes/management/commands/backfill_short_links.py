@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from foodgram.settings import ITERATOR_CHUNK_SIZE
+from recipes.models import Recipe
+from recipes.shortlinks import encode_short_link
+from recipes.views import resolve_short_link
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Переводит короткие ссылки рецептов на детерминированные коды.'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        recipes = []
+        for recipe in Recipe.objects.only('id', 'short_link').iterator(
+            chunk_size=ITERATOR_CHUNK_SIZE
+        ):
+            short_link = encode_short_link(recipe.pk)
+            if recipe.short_link != short_link:
+                recipe.short_link = short_link
+                recipes.append(recipe)
+        Recipe.objects.bulk_update(
+            recipes, ['short_link'], batch_size=BATCH_SIZE
+        )
+        resolve_short_link.cache_clear()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено коротких ссылок: {len(recipes)}'
+        ))
@@ -1,21 +1,120 @@
 import csv
+import hashlib
+import json
+from pathlib import Path
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
-from recipes.models import Ingredient
+from foodgram.settings import DATA_DIR, ITERATOR_CHUNK_SIZE
+from recipes.models import CatalogImport, Ingredient
+from recipes.signals import ingredients_imported
+
+BATCH_SIZE = 500
+CHUNK_SIZE = 64 * 1024
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if row:
+                yield row[0], row[1]
+
+
+def read_json(path):
+    with open(path, encoding='utf-8') as f:
+        for item in json.load(f):
+            yield item['name'], item['measurement_unit']
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
 
 
 class Command(BaseCommand):
+    help = 'Загружает ингредиенты из CSV или JSON файла.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'file', nargs='?', default='ingredients.csv',
+            help='Имя файла в DATA_DIR или путь к нему.'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Импортировать, даже если файл не изменился.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Размер пакета для bulk_create и bulk_update.'
+        )
 
     def handle(self, *args, **options):
-        self.import_ingredients()
-
-    def import_ingredients(self, file='ingredients.csv'):
-        file_path = f'/app/data/{file}'
-        with open(file_path, newline='', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            for row in reader:
-                status, created = Ingredient.objects.update_or_create(
-                    name=row[0],
-                    measurement_unit=row[1]
+        path = Path(options['file'])
+        if not path.is_absolute():
+            path = DATA_DIR / path
+        reader = READERS.get(path.suffix.lower())
+        if reader is None:
+            raise CommandError(f'Неподдерживаемый формат файла: {path}')
+        if not path.exists():
+            raise CommandError(f'Файл не найден: {path}')
+        checksum = file_checksum(path)
+        last_import = CatalogImport.objects.filter(file_name=path.name).first()
+        if (not options['force'] and last_import
+                and last_import.checksum == checksum):
+            self.stdout.write(f'{path.name} не изменился, импорт пропущен.')
+            return
+        inserted, updated, unchanged = self.import_ingredients(
+            reader(path), options['batch_size']
+        )
+        CatalogImport.objects.update_or_create(
+            file_name=path.name, defaults={'checksum': checksum}
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{path.name}: добавлено {inserted}, обновлено {updated}, '
+            f'без изменений {unchanged}.'
+        ))
+
+    @transaction.atomic
+    def import_ingredients(self, rows, batch_size):
+        existing = {
+            name: (pk, measurement_unit)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            ).iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+        }
+        to_create, to_update = {}, {}
+        unchanged = 0
+        for name, measurement_unit in rows:
+            if name not in existing:
+                to_create[name] = Ingredient(
+                    name=name, measurement_unit=measurement_unit
+                )
+            elif existing[name][1] != measurement_unit:
+                to_update[name] = Ingredient(
+                    id=existing[name][0],
+                    name=name,
+                    measurement_unit=measurement_unit
                 )
+            else:
+                unchanged += 1
+        Ingredient.objects.bulk_create(
+            to_create.values(), batch_size=batch_size
+        )
+        Ingredient.objects.bulk_update(
+            to_update.values(), ['measurement_unit'], batch_size=batch_size
+        )
+        if to_create or to_update:
+            transaction.on_commit(
+                lambda: ingredients_imported.send(sender=Ingredient)
+            )
+        return len(to_create), len(to_update), unchanged
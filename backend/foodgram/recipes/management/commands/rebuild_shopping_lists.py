@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.shopping_list import apply_deltas, compute_drift
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает списки покупок по корзинам и исправляет '
+            'расхождения с ShoppingListItem.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только показать расхождения, не исправляя их.'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drift = compute_drift()
+            if not options['verify']:
+                apply_deltas(drift)
+        for (user_id, ingredient_id), delta in sorted(drift.items()):
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id} '
+                f'delta={delta:+d}'
+            )
+        action = 'Найдено' if options['verify'] else 'Исправлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} расхождений: {len(drift)}'
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.popularity import apply_drift, compute_drift
+
+
+class Command(BaseCommand):
+    help = ('Сверяет счётчики избранного и корзин рецептов с фактическим '
+            'числом отметок и исправляет расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только показать расхождения, не исправляя их.'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drift = compute_drift()
+            if not options['verify']:
+                apply_drift(drift)
+        for pk, counters in sorted(drift.items()):
+            values = ' '.join(
+                f'{field}={value}' for field, value in sorted(counters.items())
+            )
+            self.stdout.write(f'recipe={pk} {values}')
+        action = 'Найдено' if options['verify'] else 'Исправлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} расхождений: {len(drift)}'
+        ))
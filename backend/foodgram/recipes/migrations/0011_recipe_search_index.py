@@ -0,0 +1,45 @@
+from django.db import migrations
+
+CREATE_SQL = {
+    'sqlite': [
+        'CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts USING fts5('
+        "name, text, tokenize='unicode61 remove_diacritics 2')",
+        'INSERT INTO recipes_recipe_fts (rowid, name, text) '
+        'SELECT id, name, text FROM recipes_recipe',
+    ],
+    'postgresql': [
+        'CREATE TABLE IF NOT EXISTS recipes_recipe_search ('
+        'recipe_id bigint PRIMARY KEY REFERENCES recipes_recipe (id) '
+        'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+        'document tsvector NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS recipes_recipe_search_document_idx '
+        'ON recipes_recipe_search USING GIN (document)',
+        'INSERT INTO recipes_recipe_search (recipe_id, document) '
+        "SELECT id, setweight(to_tsvector('russian', name), 'A') "
+        "|| setweight(to_tsvector('russian', text), 'B') "
+        'FROM recipes_recipe',
+    ],
+}
+
+DROP_SQL = {
+    'sqlite': ['DROP TABLE IF EXISTS recipes_recipe_fts'],
+    'postgresql': ['DROP TABLE IF EXISTS recipes_recipe_search'],
+}
+
+
+def run_sql(statements):
+    def operation(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_feedentry'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql(CREATE_SQL), run_sql(DROP_SQL)),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 3.2.16 on 2026-10-18 05:03
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Промежуточная таблица тегов создаётся Django с уникальным индексом
+# (recipe_id, tag_id); фильтр ?tags= ищет по tag_id, для него нужен
+# обратный индекс, который не выразить через Meta.indexes
+CREATE_SQL = {
+    vendor: [
+        'CREATE INDEX IF NOT EXISTS recipe_tags_tag_recipe_idx '
+        'ON recipes_recipe_tags (tag_id, recipe_id)',
+    ]
+    for vendor in ('sqlite', 'postgresql')
+}
+
+DROP_SQL = {
+    vendor: ['DROP INDEX IF EXISTS recipe_tags_tag_recipe_idx']
+    for vendor in CREATE_SQL
+}
+
+
+def run_sql(statements):
+    def operation(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0012_recipe_popularity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['author', 'recipe'], name='cart_author_recipe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favourite',
+            index=models.Index(fields=['author', 'recipe'], name='favourite_author_recipe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredientforrecipe',
+            index=models.Index(fields=['ingredient', 'amount'], name='ingredient_line_idx'),
+        ),
+        migrations.AlterField(
+            model_name='cart',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='carts', to=settings.AUTH_USER_MODEL, verbose_name='Автор корзины'),
+        ),
+        migrations.AlterField(
+            model_name='favourite',
+            name='author',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='favorites', to=settings.AUTH_USER_MODEL, verbose_name='Автор избранного'),
+        ),
+        migrations.AlterField(
+            model_name='ingredientforrecipe',
+            name='ingredient',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='recipes.ingredient', verbose_name='Ингредиенты для рецепта'),
+        ),
+        migrations.RunPython(run_sql(CREATE_SQL), run_sql(DROP_SQL)),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+# Django не знает о таблице индекса и очищает recipes_recipe без неё:
+# TRUNCATE на PostgreSQL отказывается работать с таблицей, на которую
+# ссылается внешний ключ. Строки индекса удаляет сигнал post_delete
+CREATE_SQL = {
+    'postgresql': [
+        'ALTER TABLE recipes_recipe_search '
+        'DROP CONSTRAINT IF EXISTS recipes_recipe_search_recipe_id_fkey',
+    ],
+}
+
+DROP_SQL = {
+    'postgresql': [
+        'DELETE FROM recipes_recipe_search WHERE recipe_id NOT IN '
+        '(SELECT id FROM recipes_recipe)',
+        'ALTER TABLE recipes_recipe_search '
+        'ADD CONSTRAINT recipes_recipe_search_recipe_id_fkey '
+        'FOREIGN KEY (recipe_id) REFERENCES recipes_recipe (id) '
+        'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED',
+    ],
+}
+
+
+def run_sql(statements):
+    def operation(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_index_audit'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_sql(CREATE_SQL), run_sql(DROP_SQL)),
+    ]
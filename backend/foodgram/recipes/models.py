@@ -1,9 +1,9 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.db.models import UniqueConstraint
-import shortuuid
 
 from foodgram.settings import MAX_LEN_NAME
+from .shortlinks import encode_short_link
 from .validators import cooking_time_validator, amount_validator
 
 
@@ -33,15 +33,36 @@ class Recipe(models.Model):
         verbose_name='Ингредиент'
     )
     image = models.ImageField('Фото', blank=True)
-    short_link = models.CharField(max_length=10, unique=True, blank=True)
+    short_link = models.CharField(
+        max_length=10, unique=True, blank=True, null=True
+    )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном', default=0, editable=False
+    )
+    carts_count = models.PositiveIntegerField(
+        'В корзинах', default=0, editable=False
+    )
 
     def save(self, *args, **kwargs):
-        if not self.short_link:
-            self.short_link = shortuuid.ShortUUID().random(length=3)
         super().save(*args, **kwargs)
+        if not self.short_link:
+            self.short_link = encode_short_link(self.pk)
+            Recipe.objects.filter(pk=self.pk).update(
+                short_link=self.short_link
+            )
 
     class Meta:
         ordering = ('-id',)
+        indexes = [
+            models.Index(
+                fields=('-favorites_count', '-id'),
+                name='recipe_favorites_count_idx'
+            ),
+            models.Index(
+                fields=('-carts_count', '-id'),
+                name='recipe_carts_count_idx'
+            ),
+        ]
         verbose_name = 'рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -96,6 +117,7 @@ class IngredientForRecipe(models.Model):
         Ingredient,
         on_delete=models.CASCADE,
         verbose_name='Ингредиенты для рецепта',
+        db_index=False,
     )
     amount = models.PositiveSmallIntegerField(
         verbose_name='Количество', validators=[amount_validator],
@@ -103,6 +125,12 @@ class IngredientForRecipe(models.Model):
 
     class Meta:
         ordering = ('id',)
+        indexes = [
+            models.Index(
+                fields=('ingredient', 'amount'),
+                name='ingredient_line_idx'
+            ),
+        ]
         verbose_name = 'ингредиент для рецепта'
         verbose_name_plural = 'Ингредиенты для рецепта'
 
@@ -121,11 +149,17 @@ class Cart(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='carts',
-        verbose_name='Автор корзины'
+        verbose_name='Автор корзины',
+        db_index=False,
     )
 
     class Meta:
         ordering = ('id',)
+        indexes = [
+            models.Index(
+                fields=('author', 'recipe'), name='cart_author_recipe_idx'
+            ),
+        ]
         verbose_name = 'корзина'
         verbose_name_plural = 'Корзины'
         constraints = [
@@ -148,11 +182,18 @@ class Favourite(models.Model):
         User,
         on_delete=models.CASCADE,
         related_name='favorites',
-        verbose_name='Автор избранного'
+        verbose_name='Автор избранного',
+        db_index=False,
     )
 
     class Meta:
         ordering = ('id',)
+        indexes = [
+            models.Index(
+                fields=('author', 'recipe'),
+                name='favourite_author_recipe_idx'
+            ),
+        ]
         verbose_name = 'избранное'
         verbose_name_plural = 'Список избранных рецептов'
         constraints = [
@@ -162,3 +203,84 @@ class Favourite(models.Model):
 
     def __str__(self):
         return f'Список избранного пользователя: {self.author.username}'
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name='Общее количество', default=0
+    )
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'позиция списка покупок'
+        verbose_name_plural = 'Списки покупок'
+        constraints = [
+            UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_item')
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient.name} — {self.total_amount}'
+
+
+class CatalogImport(models.Model):
+    file_name = models.CharField(
+        max_length=MAX_LEN_NAME,
+        verbose_name='Файл',
+        unique=True
+    )
+    checksum = models.CharField(
+        max_length=64,
+        verbose_name='Контрольная сумма'
+    )
+    imported_at = models.DateTimeField(
+        verbose_name='Дата импорта',
+        auto_now=True
+    )
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'импорт каталога'
+        verbose_name_plural = 'Импорты каталога'
+
+    def __str__(self):
+        return self.file_name
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+
+    class Meta:
+        ordering = ('-recipe',)
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            UniqueConstraint(
+                fields=('user', 'recipe'), name='unique_feed_entry')
+        ]
+
+    def __str__(self):
+        return f'Лента пользователя {self.user_id}: {self.recipe_id}'
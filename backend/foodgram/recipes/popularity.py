@@ -0,0 +1,41 @@
+from django.db.models import Count, F
+
+from .models import Cart, Favourite, Recipe
+
+# Счётчик рецепта для каждой модели отметок
+COUNTERS = {
+    Favourite: ('favorites_count', 'favorites'),
+    Cart: ('carts_count', 'carts'),
+}
+
+# Порядок «популярные»: сначала по избранному, затем по корзинам
+POPULAR_ORDERING = ('-favorites_count', '-carts_count', '-id')
+
+
+def counter_changed(instance, sign):
+    """Атомарно меняет счётчик рецепта при добавлении или удалении отметки."""
+    field, _ = COUNTERS[type(instance)]
+    recipes = Recipe.objects.filter(pk=instance.recipe_id)
+    if sign < 0:
+        # Не уходим ниже нуля, даже если счётчик уже разошёлся с данными
+        recipes = recipes.filter(**{f'{field}__gt': 0})
+    recipes.update(**{field: F(field) + sign})
+
+
+def compute_drift():
+    """Рецепты, у которых счётчики расходятся с фактическим числом отметок.
+
+    Возвращает словарь {id рецепта: {поле: верное значение}}.
+    """
+    drift = {}
+    for field, related_name in COUNTERS.values():
+        for pk, actual in Recipe.objects.annotate(
+            actual=Count(related_name)
+        ).exclude(**{field: F('actual')}).values_list('pk', 'actual'):
+            drift.setdefault(pk, {})[field] = actual
+    return drift
+
+
+def apply_drift(drift):
+    for pk, counters in drift.items():
+        Recipe.objects.filter(pk=pk).update(**counters)
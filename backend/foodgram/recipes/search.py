@@ -0,0 +1,107 @@
+"""Полнотекстовый индекс рецептов по названию и описанию.
+
+Индекс хранится в отдельной таблице: на SQLite — виртуальная таблица
+FTS5, на PostgreSQL — столбец tsvector с GIN-индексом и русской
+морфологией. Таблицы создаёт миграция, актуальность поддерживают
+сигналы Recipe. На других СУБД поиск выполняется через icontains.
+"""
+import re
+
+from django.db import connections, router
+
+from .models import Recipe
+
+FTS_TABLE = 'recipes_recipe_fts'
+TSVECTOR_TABLE = 'recipes_recipe_search'
+WORD = re.compile(r'\w+')
+
+
+def get_connection():
+    return connections[router.db_for_write(Recipe)]
+
+
+def index_recipe(recipe_id, name, text):
+    connection = get_connection()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [recipe_id]
+            )
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, text) '
+                'VALUES (%s, %s, %s)', [recipe_id, name, text]
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f'INSERT INTO {TSVECTOR_TABLE} (recipe_id, document) '
+                "VALUES (%s, setweight(to_tsvector('russian', %s), 'A') "
+                "|| setweight(to_tsvector('russian', %s), 'B')) "
+                'ON CONFLICT (recipe_id) DO UPDATE '
+                'SET document = EXCLUDED.document',
+                [recipe_id, name, text]
+            )
+
+
+def remove_recipe(recipe_id):
+    connection = get_connection()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [recipe_id]
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                f'DELETE FROM {TSVECTOR_TABLE} WHERE recipe_id = %s',
+                [recipe_id]
+            )
+
+
+def search_recipes(queryset, query):
+    """Рецепты из queryset, найденные по запросу, по убыванию релевантности.
+
+    Таблица индекса присоединяется к запросу рецептов, поэтому условие
+    поиска и ранжирование выполняются вместе с остальными фильтрами и
+    найденное не обрезается до их применения.
+    Возвращает None, если СУБД не поддерживает полнотекстовый индекс.
+    """
+    words = WORD.findall(query)
+    if not words:
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    recipe_id = f'{Recipe._meta.db_table}.id'
+    if vendor == 'sqlite':
+        # Морфологии для русского в FTS5 нет, поэтому слова ищутся
+        # как префиксы: «борщ» находит «борща» и «борщом».
+        # Унарный плюс не даёт планировщику искать в FTS по rowid для
+        # каждого рецепта (MATCH выполнялся бы заново на каждой строке):
+        # индекс читается один раз, рецепты — по первичному ключу.
+        # bm25 тем меньше, чем релевантнее рецепт
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[
+                f'{recipe_id} = +{FTS_TABLE}.rowid',
+                f'{FTS_TABLE} MATCH %s',
+            ],
+            params=[' '.join(f'"{word}"*' for word in words)],
+            select={'search_rank': f'bm25({FTS_TABLE}, 10.0, 1.0)'},
+            order_by=['search_rank', '-id'],
+        )
+    if vendor == 'postgresql':
+        # Как и на SQLite, слова ищутся как префиксы
+        tsquery = "to_tsquery('russian', %s)"
+        params = [' & '.join(f'{word}:*' for word in words)]
+        return queryset.extra(
+            tables=[TSVECTOR_TABLE],
+            where=[
+                f'{TSVECTOR_TABLE}.recipe_id = {recipe_id}',
+                f'{TSVECTOR_TABLE}.document @@ {tsquery}',
+            ],
+            params=params,
+            select={
+                'search_rank':
+                    f'ts_rank({TSVECTOR_TABLE}.document, {tsquery})',
+            },
+            select_params=params,
+            order_by=['-search_rank', '-id'],
+        )
+    return None
@@ -0,0 +1,130 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from foodgram.settings import ITERATOR_CHUNK_SIZE
+
+from .models import Cart, IngredientForRecipe, ShoppingListItem
+
+
+def collect_deltas(user_ids, lines, sign=1):
+    """Изменения списка покупок для пользователей по строкам рецепта."""
+    deltas = Counter()
+    for ingredient_id, amount in lines:
+        for user_id in user_ids:
+            deltas[(user_id, ingredient_id)] += sign * amount
+    return deltas
+
+
+def apply_deltas(deltas):
+    """Применяет изменения к ShoppingListItem за фиксированное число запросов.
+
+    Количество меняется в БД выражением F() + delta, без чтения текущего
+    значения, поэтому параллельные изменения не теряются. Недостающие
+    позиции сначала создаются с нулём; конфликт значит, что их уже создал
+    другой процесс. Позиции, количество в которых стало нулевым,
+    удаляются.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    user_ids = {user_id for user_id, _ in deltas}
+    users_by_change = defaultdict(set)
+    for (user_id, ingredient_id), delta in deltas.items():
+        users_by_change[(ingredient_id, delta)].add(user_id)
+    changes = [
+        # Обычно изменение одно для всех пользователей: условие по
+        # пользователям тогда уже есть в фильтре запроса
+        When(
+            Q(ingredient_id=ingredient_id)
+            if users == user_ids
+            else Q(ingredient_id=ingredient_id, user_id__in=users),
+            then=Value(delta)
+        )
+        for (ingredient_id, delta), users in users_by_change.items()
+    ]
+    items = ShoppingListItem.objects.filter(
+        user_id__in=user_ids,
+        ingredient_id__in={ingredient_id for _, ingredient_id in deltas},
+    )
+    with transaction.atomic():
+        ShoppingListItem.objects.bulk_create(
+            [
+                ShoppingListItem(
+                    user_id=user_id, ingredient_id=ingredient_id,
+                    total_amount=0
+                )
+                for (user_id, ingredient_id), delta in deltas.items()
+                if delta > 0
+            ],
+            ignore_conflicts=True,
+        )
+        items.update(total_amount=Greatest(
+            F('total_amount') + Case(
+                *changes, default=Value(0), output_field=IntegerField()
+            ),
+            Value(0),
+        ))
+        items.filter(total_amount=0).delete()
+
+
+def recipe_lines(recipe_id, line_ids=None):
+    lines = IngredientForRecipe.objects.filter(recipes=recipe_id)
+    if line_ids is not None:
+        lines = lines.filter(pk__in=line_ids)
+    return list(lines.values_list('ingredient_id', 'amount'))
+
+
+def cart_changed(cart, sign):
+    apply_deltas(collect_deltas(
+        [cart.author_id], recipe_lines(cart.recipe_id), sign
+    ))
+
+
+def recipe_lines_changed(recipe_id, line_ids, sign):
+    user_ids = list(
+        Cart.objects.filter(recipe=recipe_id).values_list(
+            'author_id', flat=True
+        )
+    )
+    if user_ids:
+        apply_deltas(collect_deltas(
+            user_ids, recipe_lines(recipe_id, line_ids), sign
+        ))
+
+
+def compute_expected():
+    """Список покупок всех пользователей, посчитанный заново по корзинам."""
+    rows = Cart.objects.filter(
+        recipe__ingredients__isnull=False
+    ).values(
+        'author_id', 'recipe__ingredients__ingredient_id'
+    ).annotate(
+        total=Sum('recipe__ingredients__amount')
+    ).order_by()
+    return {
+        (row['author_id'], row['recipe__ingredients__ingredient_id']):
+            row['total']
+        for row in rows.iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+    }
+
+
+def compute_drift():
+    """Расхождения между ShoppingListItem и пересчётом с нуля."""
+    expected = compute_expected()
+    items = ShoppingListItem.objects.values_list(
+        'user_id', 'ingredient_id', 'total_amount'
+    )
+    actual = {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in items.iterator(
+            chunk_size=ITERATOR_CHUNK_SIZE
+        )
+    }
+    return {
+        key: expected.get(key, 0) - actual.get(key, 0)
+        for key in expected.keys() | actual.keys()
+        if expected.get(key, 0) != actual.get(key, 0)
+    }
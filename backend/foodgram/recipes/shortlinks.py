@@ -0,0 +1,36 @@
+import string
+
+from foodgram.settings import SHORT_LINK_MULTIPLIER
+
+ALPHABET = string.digits + string.ascii_letters
+BASE = len(ALPHABET)
+LENGTH = 7
+MODULUS = BASE ** LENGTH
+INVERSE = pow(SHORT_LINK_MULTIPLIER, -1, MODULUS)
+DIGITS = {char: value for value, char in enumerate(ALPHABET)}
+
+
+def encode_short_link(pk):
+    """Обратимо кодирует id рецепта в код из LENGTH символов base62.
+
+    Умножение на число, взаимно простое с модулем, — биекция, поэтому
+    коды различных id (меньших MODULUS) не совпадают.
+    """
+    if not 0 < pk < MODULUS:
+        raise ValueError(f'id {pk} вне диапазона коротких ссылок.')
+    number = pk * SHORT_LINK_MULTIPLIER % MODULUS
+    code = []
+    for _ in range(LENGTH):
+        number, digit = divmod(number, BASE)
+        code.append(ALPHABET[digit])
+    return ''.join(reversed(code))
+
+
+def decode_short_link(code):
+    """Возвращает id рецепта по коду или None для чужого формата."""
+    if len(code) != LENGTH or any(char not in DIGITS for char in code):
+        return None
+    number = 0
+    for char in code:
+        number = number * BASE + DIGITS[char]
+    return number * INVERSE % MODULUS or None
@@ -0,0 +1,123 @@
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import Signal, receiver
+
+from users.models import Follow
+from .feed import backfill_feed, clear_feed, fan_out_recipe
+from .indexes import ingredient_index, recipe_ingredient_index
+from .models import (Cart, Favourite, Ingredient, IngredientForRecipe,
+                     Recipe)
+from .popularity import counter_changed
+from .search import index_recipe, remove_recipe
+from .shopping_list import cart_changed, recipe_lines_changed
+from .views import resolve_short_link
+
+# Отправляется после массового импорта ингредиентов: bulk-операции
+# не вызывают post_save
+ingredients_imported = Signal()
+
+
+@receiver(ingredients_imported)
+@receiver([post_save, post_delete], sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    # После коммита: иначе другой процесс мог бы перестроить индекс по
+    # старым данным уже с новой версией
+    transaction.on_commit(ingredient_index.invalidate)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_recipe_ingredient_index(sender, instance, action, reverse,
+                                   **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        transaction.on_commit(recipe_ingredient_index.invalidate)
+    else:
+        transaction.on_commit(
+            lambda: recipe_ingredient_index.refresh(instance.pk)
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_recipe_ingredient_index(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: recipe_ingredient_index.remove(pk))
+
+
+@receiver(post_delete, sender=IngredientForRecipe)
+def invalidate_recipe_ingredient_index(sender, **kwargs):
+    transaction.on_commit(recipe_ingredient_index.invalidate)
+
+
+@receiver(post_delete, sender=Recipe)
+def clear_short_link_cache(sender, **kwargs):
+    resolve_short_link.cache_clear()
+
+
+@receiver(post_save, sender=Recipe)
+def update_search_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {'name', 'text'} & set(update_fields):
+        index_recipe(instance.pk, instance.name, instance.text)
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_search_index(sender, instance, **kwargs):
+    remove_recipe(instance.pk)
+
+
+@receiver(post_save, sender=Recipe)
+def add_recipe_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        fan_out_recipe(instance)
+
+
+@receiver(post_save, sender=Follow)
+def add_author_to_feed(sender, instance, created, **kwargs):
+    if created:
+        backfill_feed(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_author_from_feed(sender, instance, **kwargs):
+    clear_feed(instance)
+
+
+@receiver(post_save, sender=Cart)
+@receiver(post_save, sender=Favourite)
+def increment_popularity(sender, instance, created, **kwargs):
+    if created:
+        counter_changed(instance, 1)
+
+
+@receiver(post_delete, sender=Cart)
+@receiver(post_delete, sender=Favourite)
+def decrement_popularity(sender, instance, **kwargs):
+    counter_changed(instance, -1)
+
+
+@receiver(post_save, sender=Cart)
+def add_cart_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        cart_changed(instance, 1)
+
+
+@receiver(pre_delete, sender=Cart)
+def remove_cart_from_shopping_list(sender, instance, **kwargs):
+    cart_changed(instance, -1)
+
+
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_shopping_lists(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    if action not in ('post_add', 'pre_remove', 'pre_clear'):
+        return
+    sign = 1 if action == 'post_add' else -1
+    if not reverse:
+        recipe_lines_changed(instance.pk, pk_set, sign)
+        return
+    recipe_ids = pk_set
+    if action == 'pre_clear':
+        recipe_ids = instance.recipes.values_list('pk', flat=True)
+    for recipe_id in list(recipe_ids):
+        recipe_lines_changed(recipe_id, [instance.pk], sign)
@@ -0,0 +1,89 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from recipes.feed import feed_filter
+from recipes.models import FeedEntry, Recipe
+from users.models import Follow
+
+User = get_user_model()
+
+
+@mock.patch('recipes.feed.FEED_FANOUT_LIMIT', 2)
+class FeedTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@example.com'
+        )
+        cls.readers = [
+            User.objects.create_user(
+                username=f'reader{i}', email=f'reader{i}@example.com'
+            )
+            for i in range(3)
+        ]
+
+    def follow(self, *readers):
+        for reader in readers:
+            Follow.objects.create(user=reader, author=self.author)
+
+    def create_recipe(self, name):
+        return Recipe.objects.create(
+            name=name, text=name, author=self.author, cooking_time=10
+        )
+
+    def feed(self, user):
+        return set(
+            Recipe.objects.filter(feed_filter(user)).values_list(
+                'name', flat=True
+            )
+        )
+
+    def is_merged(self):
+        self.author.refresh_from_db(fields=('feed_merged',))
+        return self.author.feed_merged
+
+    def test_fan_out_below_limit(self):
+        self.follow(*self.readers[:2])
+        recipe = self.create_recipe('Блины')
+        self.assertFalse(self.is_merged())
+        self.assertEqual(
+            set(FeedEntry.objects.filter(recipe=recipe).values_list(
+                'user_id', flat=True
+            )),
+            {reader.pk for reader in self.readers[:2]}
+        )
+        self.assertEqual(self.feed(self.readers[0]), {'Блины'})
+        self.assertEqual(self.feed(self.readers[2]), set())
+
+    def test_merge_above_limit(self):
+        self.follow(*self.readers)
+        self.assertTrue(self.is_merged())
+        recipe = self.create_recipe('Блины')
+        self.assertFalse(FeedEntry.objects.filter(recipe=recipe).exists())
+        for reader in self.readers:
+            self.assertEqual(self.feed(reader), {'Блины'})
+
+    def test_crossing_limit_keeps_recipes(self):
+        self.follow(*self.readers[:2])
+        self.create_recipe('Блины')
+        self.follow(self.readers[2])
+        self.create_recipe('Хлеб')
+        self.assertEqual(self.feed(self.readers[0]), {'Блины', 'Хлеб'})
+        # Подписчиков снова не больше лимита: рецепт, созданный в режиме
+        # чтения, не должен пропасть из лент
+        Follow.objects.filter(user=self.readers[2]).delete()
+        self.assertTrue(self.is_merged())
+        self.create_recipe('Суп')
+        self.assertEqual(
+            self.feed(self.readers[0]), {'Блины', 'Хлеб', 'Суп'}
+        )
+        self.assertEqual(self.feed(self.readers[2]), set())
+
+    def test_unfollow_clears_feed(self):
+        self.follow(self.readers[0])
+        self.create_recipe('Блины')
+        Follow.objects.filter(user=self.readers[0]).delete()
+        self.assertEqual(self.feed(self.readers[0]), set())
@@ -0,0 +1,32 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from recipes.indexes import IngredientNameIndex
+from recipes.models import Ingredient
+
+
+class IngredientNameIndexTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        Ingredient.objects.create(name='Соль', measurement_unit='г')
+        # Копии индекса в двух процессах с общим кэшем
+        self.worker = IngredientNameIndex()
+        self.other_worker = IngredientNameIndex()
+
+    def names(self, query):
+        return [row['name'] for row in self.worker.search(query)]
+
+    def test_change_in_other_process_rebuilds_index(self):
+        self.assertEqual(self.names('со'), ['Соль'])
+        Ingredient.objects.create(name='Сода', measurement_unit='г')
+        self.other_worker.invalidate()
+        self.assertEqual(self.names('со'), ['Сода', 'Соль'])
+
+    def test_signal_bumps_version_after_commit(self):
+        self.assertEqual(self.names('со'), ['Соль'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Ingredient.objects.filter(name='Соль').update(name='Сахар')
+            Ingredient.objects.get(name='Сахар').save()
+        self.assertEqual(self.names('са'), ['Сахар'])
+        self.assertEqual(self.names('со'), [])
@@ -0,0 +1,57 @@
+import io
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from foodgram.settings import DATA_DIR
+from recipes.management.commands.load_data import read_csv, read_json
+from recipes.models import Ingredient
+
+
+class LoadDataTest(TestCase):
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def load(self, *args):
+        stdout = io.StringIO()
+        call_command('load_data', *map(str, args), stdout=stdout)
+        return stdout.getvalue()
+
+    def write_json(self, rows):
+        path = self.directory / 'catalog.json'
+        path.write_text(json.dumps([
+            {'name': name, 'measurement_unit': unit} for name, unit in rows
+        ], ensure_ascii=False), encoding='utf-8')
+        return path
+
+    def test_csv_and_json_fixtures_match(self):
+        self.assertEqual(
+            list(read_csv(DATA_DIR / 'ingredients.csv')),
+            list(read_json(DATA_DIR / 'ingredients.json'))
+        )
+
+    def test_loads_both_fixtures_from_data_dir(self):
+        self.load('ingredients.json')
+        count = Ingredient.objects.count()
+        self.assertGreater(count, 0)
+        self.assertIn(
+            'добавлено 0, обновлено 0', self.load('ingredients.csv')
+        )
+        self.assertEqual(Ingredient.objects.count(), count)
+
+    def test_unchanged_file_skipped(self):
+        path = self.write_json([('соль', 'г')])
+        self.load(path)
+        self.assertIn('импорт пропущен', self.load(path))
+        self.write_json([('соль', 'щепотка')])
+        self.assertIn('обновлено 1', self.load(path))
+        self.assertEqual(
+            Ingredient.objects.get(name='соль').measurement_unit, 'щепотка'
+        )
+        self.assertIn('без изменений 1', self.load(path, '--force'))
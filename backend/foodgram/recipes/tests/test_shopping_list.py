@@ -0,0 +1,94 @@
+import threading
+from unittest import skipIf
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from recipes.models import (Cart, Ingredient, IngredientForRecipe, Recipe,
+                            ShoppingListItem)
+from recipes.shopping_list import apply_deltas
+
+User = get_user_model()
+
+
+def shopping_list(user):
+    return dict(
+        ShoppingListItem.objects.filter(user=user).values_list(
+            'ingredient__name', 'total_amount'
+        )
+    )
+
+
+class ShoppingListTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='cooker', email='cooker@example.com'
+        )
+        salt, flour = (
+            Ingredient.objects.create(name=name, measurement_unit='г')
+            for name in ('соль', 'мука')
+        )
+        cls.pancakes = Recipe.objects.create(
+            name='Блины', text='Блины', author=cls.user, cooking_time=20
+        )
+        cls.pancakes.ingredients.set([
+            IngredientForRecipe.objects.create(ingredient=salt, amount=5),
+            IngredientForRecipe.objects.create(ingredient=flour, amount=200),
+        ])
+        cls.bread = Recipe.objects.create(
+            name='Хлеб', text='Хлеб', author=cls.user, cooking_time=60
+        )
+        cls.bread.ingredients.set([
+            IngredientForRecipe.objects.create(ingredient=flour, amount=500),
+        ])
+
+    def test_cart_changes_update_shopping_list(self):
+        Cart.objects.create(author=self.user, recipe=self.pancakes)
+        Cart.objects.create(author=self.user, recipe=self.bread)
+        self.assertEqual(shopping_list(self.user), {'соль': 5, 'мука': 700})
+        Cart.objects.get(recipe=self.pancakes).delete()
+        self.assertEqual(shopping_list(self.user), {'мука': 500})
+
+    def test_apply_deltas_uses_current_amount(self):
+        Cart.objects.create(author=self.user, recipe=self.bread)
+        flour = Ingredient.objects.get(name='мука')
+        # Изменение другого процесса после того, как deltas посчитаны
+        ShoppingListItem.objects.filter(user=self.user).update(
+            total_amount=600
+        )
+        apply_deltas({(self.user.pk, flour.pk): -500})
+        self.assertEqual(shopping_list(self.user), {'мука': 100})
+
+    def test_fixed_number_of_queries(self):
+        with self.assertNumQueries(8):
+            Cart.objects.create(author=self.user, recipe=self.pancakes)
+
+
+@skipIf(connection.vendor == 'sqlite', 'SQLite сериализует запись')
+class ConcurrentShoppingListTest(TransactionTestCase):
+
+    def test_concurrent_deltas_are_not_lost(self):
+        user = User.objects.create_user(
+            username='cooker', email='cooker@example.com'
+        )
+        ingredient = Ingredient.objects.create(
+            name='соль', measurement_unit='г'
+        )
+        key = (user.pk, ingredient.pk)
+
+        def worker():
+            try:
+                for _ in range(30):
+                    apply_deltas({key: 1})
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(shopping_list(user), {'соль': 120})
@@ -0,0 +1,35 @@
+from functools import lru_cache
+
+from django.http import Http404, HttpResponsePermanentRedirect
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_safe
+
+from foodgram.settings import SHORT_LINK_CACHE_SIZE, SHORT_LINK_MAX_AGE
+from .models import Recipe
+from .shortlinks import decode_short_link
+
+
+@lru_cache(maxsize=SHORT_LINK_CACHE_SIZE)
+def resolve_short_link(code):
+    """id рецепта по короткому коду; повторные коды берутся из LRU-кэша.
+
+    Коды старого формата ищутся по полю short_link, пока не выполнена
+    команда backfill_short_links.
+    """
+    pk = decode_short_link(code)
+    if pk is not None and Recipe.objects.filter(pk=pk).exists():
+        return pk
+    pk = Recipe.objects.filter(short_link=code).values_list(
+        'pk', flat=True
+    ).first()
+    if pk is None:
+        raise Http404('Рецепт не найден.')
+    return pk
+
+
+@require_safe
+@cache_control(public=True, max_age=SHORT_LINK_MAX_AGE)
+def short_link_redirect(request, code):
+    return HttpResponsePermanentRedirect(
+        f'/recipes/{resolve_short_link(code)}/'
+    )
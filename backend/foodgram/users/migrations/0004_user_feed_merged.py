@@ -0,0 +1,32 @@
+# Generated by Django 3.2.16 on 2026-10-18 06:28
+
+from django.db import migrations, models
+from django.db.models import Count
+
+from foodgram.settings import FEED_FANOUT_LIMIT
+
+
+def fill_feed_merged(apps, schema_editor):
+    Follow = apps.get_model('users', 'Follow')
+    CustomUser = apps.get_model('users', 'CustomUser')
+    CustomUser.objects.filter(
+        pk__in=Follow.objects.order_by().values('author').annotate(
+            followers=Count('pk')
+        ).filter(followers__gt=FEED_FANOUT_LIMIT).values('author')
+    ).update(feed_merged=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_index_audit'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='feed_merged',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Лента при чтении'),
+        ),
+        migrations.RunPython(fill_feed_merged, migrations.RunPython.noop),
+    ]
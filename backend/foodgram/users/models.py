@@ -29,19 +29,33 @@ class CustomUser(AbstractUser):
         'email',
         unique=True, max_length=254)
     avatar = models.ImageField('Аватар', blank=True)
+    # Рецепты автора подмешиваются в ленты при чтении. Флаг не снимается:
+    # рецепты, созданные в этом режиме, не разложены по FeedEntry
+    feed_merged = models.BooleanField(
+        'Лента при чтении', default=False, editable=False
+    )
 
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
         ordering = ('id',)
 
+    def refresh_from_db(self, using=None, fields=None):
+        # Обращение к одному отложенному полю загружает все отложенные
+        # одним запросом: так работает пользователь из кэша токенов
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred.issuperset(fields):
+            fields = deferred
+        super().refresh_from_db(using=using, fields=fields)
+
 
 class Follow(models.Model):
     author = models.ForeignKey(
         CustomUser,
         related_name='respondents',
         on_delete=models.CASCADE,
-        verbose_name='Автор рецепта'
+        verbose_name='Автор рецепта',
+        db_index=False,
     )
 
     user = models.ForeignKey(
@@ -56,6 +70,11 @@ class Follow(models.Model):
             UniqueConstraint(fields=['user', 'author'],
                              name='unique_follow')
         ]
+        indexes = [
+            models.Index(
+                fields=('author', 'user'), name='follow_author_user_idx'
+            ),
+        ]
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
         ordering = ('id',)